@@ -2,10 +2,12 @@ from __future__ import annotations
 
 import argparse
 import json
+import multiprocessing
 import os
 import re
 import sys
-from dataclasses import asdict
+import time
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any
 
@@ -16,14 +18,49 @@ except ImportError:
     import tomli as tomllib
 
 from natrix.__version__ import __version__
+from natrix.ast_tools import COMPILER_ENGINES
+from natrix.cache import CompileCache
 from natrix.codegen import generate_call_graph, generate_exports
 from natrix.context import ProjectContext
-from natrix.rules.common import Issue, RuleRegistry
+from natrix.rules.common import (
+    SEVERITY_LEVELS,
+    BaseRule,
+    Issue,
+    Rule,
+    RuleRegistry,
+    run_rules,
+)
+from natrix.watch import FileWatcher, is_temporary_copy
 
 # Vyper file extensions
 VYPER_EXTENSIONS = (".vy", ".vyi")
 
 
+def issue_to_json(issue: Issue) -> dict[str, Any]:
+    """Convert an issue to the JSON object printed by `natrix lint --json`."""
+    issue_dict = asdict(issue)
+    issue_dict["file"] = str(issue.file)
+    # Remove source_code from JSON output as it's for CLI display only
+    issue_dict.pop("source_code", None)
+    return issue_dict
+
+
+def issue_from_json(issue_dict: dict[str, Any]) -> Issue:
+    """Convert an issue back from its JSON object, see `issue_to_json`."""
+    start_position = issue_dict.get("start_position")
+    end_position = issue_dict.get("end_position")
+    return Issue(
+        file=Path(issue_dict["file"]),
+        position=issue_dict["position"],
+        severity=issue_dict["severity"],
+        code=issue_dict["code"],
+        message=issue_dict["message"],
+        source_code=issue_dict.get("source_code"),
+        start_position=tuple(start_position) if start_position else None,
+        end_position=tuple(end_position) if end_position else None,
+    )
+
+
 class OutputFormatter:
     """Handles output formatting for both CLI and JSON modes."""
 
@@ -42,14 +79,7 @@ class OutputFormatter:
     def print_issues(self, issues: list[Issue]) -> None:
         """Print all issues in the appropriate format."""
         if self.json_mode:
-            # Convert Issue objects to dictionaries,
-            # excluding source_code for JSON output
-            json_issues = []
-            for issue in issues:
-                issue_dict = asdict(issue)
-                # Remove source_code from JSON output as it's for CLI display only
-                issue_dict.pop("source_code", None)
-                json_issues.append(issue_dict)
+            json_issues = [issue_to_json(issue) for issue in issues]
             print(json.dumps(json_issues, indent=2))
         else:
             # Print issues with spacing between them
@@ -58,6 +88,29 @@ class OutputFormatter:
                     print()
                 print(issue.cli_format())
 
+    def print_issue_changes(
+        self, new_issues: list[Issue], resolved_issues: list[Issue]
+    ) -> None:
+        """Print the issues that appeared and disappeared since the last run."""
+        if self.json_mode:
+            changes = {
+                "new": [issue_to_json(issue) for issue in new_issues],
+                "resolved": [issue_to_json(issue) for issue in resolved_issues],
+            }
+            # One document per line, so that consumers can stream them
+            print(json.dumps(changes), flush=True)
+            return
+
+        for issue in resolved_issues:
+            print(
+                f"Resolved {issue.file}:{issue.position} {issue.code}: {issue.message}"
+            )
+        if resolved_issues and new_issues:
+            print()
+        self.print_issues(new_issues)
+        if not new_issues and not resolved_issues:
+            print("No new or resolved issues.")
+
     def print_summary(self, has_issues: bool) -> None:
         """Print the final summary message."""
         if self.json_mode:
@@ -74,32 +127,176 @@ def lint_file(
     project_context: ProjectContext,
     formatter: OutputFormatter,
     disabled_rules: set[str] | None = None,
+    rules: list[Rule] | None = None,
 ) -> list[Issue]:
-    """Lint a single Vyper file using the pre-built project context."""
+    """
+    Lint a single Vyper file using the pre-built project context.
+
+    The rules are the ones instantiated once at startup (see
+    `RuleRegistry.get_rules`) unless other `rules` are given.
+    """
     if disabled_rules is None:
         disabled_rules = set()
+    if rules is None:
+        rules = RuleRegistry.get_rules()
+
+    # Rules that weren't selected don't have an instance. Skip rules disabled
+    # after instantiation, they may need compiler outputs that were never
+    # produced
+    rule_instances = [
+        rule.instance
+        for rule in rules
+        if rule.instance is not None and rule.code not in disabled_rules
+    ]
+
+    def report_error(rule: BaseRule, e: Exception) -> None:
+        # Simple error message with suggestion to report the issue
+        formatter.print(
+            f"Error running rule {rule.run}: {e!s}. Please report this issue on GitHub."
+        )
 
-    # Get the rule instances (already instantiated once at startup)
-    rules = RuleRegistry.get_rules()
+    # Run all rules in a single traversal of the module
+    issues = run_rules(
+        rule_instances, project_context, file_path, on_error=report_error
+    )
 
-    # Flatten the issues from all rules and filter out disabled rules
-    issues = []
-    for rule in rules:
-        try:
-            rule_issues = rule.run(project_context, file_path)
+    return issues
+
+
+# Project context, disabled rules and rules of the lint workers, inherited
+# through fork rather than pickled, see `lint_files`
+_worker_state: tuple[ProjectContext, set[str], list[Rule] | None] | None = None
+
+
+def _lint_file_in_worker(file_path: Path) -> tuple[list[Issue], list[str]]:
+    assert _worker_state is not None
+    project_context, disabled_rules, rules = _worker_state
+    # Collect the messages, the parent prints them in order
+    formatter = OutputFormatter(json_mode=True)
+    issues = lint_file(file_path, project_context, formatter, disabled_rules, rules)
+    return issues, formatter.messages
+
+
+def lint_files(
+    file_paths: list[Path],
+    project_context: ProjectContext,
+    formatter: OutputFormatter,
+    disabled_rules: set[str] | None = None,
+    jobs: int = 1,
+    rules: list[Rule] | None = None,
+) -> list[Issue]:
+    """
+    Lint several Vyper files using the pre-built project context, with the
+    given `rules` or the ones instantiated at startup.
+
+    With `jobs` > 1, the files are linted on a pool of worker processes.
+    The workers are forked so that they share the project context instead
+    of compiling it again, where fork isn't available the files are linted
+    one at a time. The issues come out in the same order either way.
+    """
+    global _worker_state
+
+    if disabled_rules is None:
+        disabled_rules = set()
+
+    jobs = min(jobs, len(file_paths))
+    if jobs <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        issues: list[Issue] = []
+        for file_path in file_paths:
             issues.extend(
-                [issue for issue in rule_issues if issue.code not in disabled_rules]
-            )
-        except Exception as e:
-            # Simple error message with suggestion to report the issue
-            formatter.print(
-                f"Error running rule {rule.run}: {e!s}. "
-                "Please report this issue on GitHub."
+                lint_file(file_path, project_context, formatter, disabled_rules, rules)
             )
+        return issues
 
+    _worker_state = (project_context, disabled_rules, rules)
+    try:
+        with multiprocessing.get_context("fork").Pool(jobs) as pool:
+            # Results are returned in the order of the files
+            results = pool.map(_lint_file_in_worker, file_paths, chunksize=1)
+    finally:
+        _worker_state = None
+
+    issues = []
+    for file_issues, messages in results:
+        for message in messages:
+            formatter.print(message)
+        issues.extend(file_issues)
     return issues
 
 
+def watch_and_lint(
+    watcher: FileWatcher,
+    project_context: ProjectContext,
+    formatter: OutputFormatter,
+    issues: list[Issue],
+    disabled_rules: set[str] | None = None,
+    jobs: int = 1,
+    interval: float = 1.0,
+) -> list[Issue]:
+    """
+    Relint the files affected by every change reported by `watcher`, until
+    interrupted, printing only the issues that changed. `issues` are the
+    issues of the initial run, the issues of the last run are returned.
+    """
+    issues_by_file: dict[Path, list[Issue]] = {}
+    for issue in issues:
+        issues_by_file.setdefault(issue.file, []).append(issue)
+
+    # Changes which couldn't be compiled, retried along with the next ones
+    pending: set[Path] = set()
+    watcher.set_files(project_context.modules)
+    try:
+        while True:
+            time.sleep(interval)
+            changed = watcher.poll()
+            if not changed:
+                continue
+            pending |= changed
+
+            try:
+                to_relint = project_context.update(pending)
+            except Exception as e:
+                formatter.print(f"{e}\nWaiting for changes...")
+                continue
+            pending = set()
+            watcher.set_files(project_context.modules)
+
+            formatter.print(
+                f"\n{len(changed)} file(s) changed, relinting {len(to_relint)} file(s)."
+            )
+            new_issues_by_file: dict[Path, list[Issue]] = {}
+            for issue in lint_files(
+                to_relint, project_context, formatter, disabled_rules, jobs=jobs
+            ):
+                new_issues_by_file.setdefault(issue.file, []).append(issue)
+
+            new_issues: list[Issue] = []
+            resolved_issues: list[Issue] = []
+            # Deleted files don't have issues anymore
+            linted = set(project_context.initial_files)
+            for file_path in [*to_relint, *(set(issues_by_file) - linted)]:
+                old = issues_by_file.pop(file_path, [])
+                new = new_issues_by_file.get(file_path, [])
+                # An issue whose snippet merely changed (e.g. the function
+                # it points to was edited) is the same issue
+                old_keys = {_issue_key(issue) for issue in old}
+                new_keys = {_issue_key(issue) for issue in new}
+                new_issues.extend(i for i in new if _issue_key(i) not in old_keys)
+                resolved_issues.extend(i for i in old if _issue_key(i) not in new_keys)
+                if new:
+                    issues_by_file[file_path] = new
+
+            formatter.print_issue_changes(new_issues, resolved_issues)
+    except KeyboardInterrupt:
+        pass
+
+    return [issue for file_issues in issues_by_file.values() for issue in file_issues]
+
+
+def _issue_key(issue: Issue) -> tuple[Path, str, str, str]:
+    return (issue.file, issue.position, issue.code, issue.message)
+
+
 def find_vy_files(directory: Path) -> list[Path]:
     # Recursively find all Vyper files (.vy and .vyi) in the given directory,
     # excluding specified directories
@@ -108,7 +305,7 @@ def find_vy_files(directory: Path) -> list[Path]:
         # Collect all Vyper files
         for file in files:
             file_path = Path(root) / file
-            if file_path.suffix in VYPER_EXTENSIONS:
+            if file_path.suffix in VYPER_EXTENSIONS and not is_temporary_copy(file):
                 vy_files.append(file_path)
 
     return vy_files
@@ -132,8 +329,11 @@ def read_pyproject_config() -> dict[str, Any]:
     config: dict[str, Any] = {
         "files": [],
         "disabled_rules": set(),
+        "select": None,
+        "min_severity": None,
         "rule_configs": {},
         "path": [],
+        "compiler_engine": "subprocess",
     }
 
     try:
@@ -158,6 +358,12 @@ def read_pyproject_config() -> dict[str, Any]:
                         natrix_config["disabled_rules"], list
                     ):
                         config["disabled_rules"] = set(natrix_config["disabled_rules"])
+                    if "select" in natrix_config and isinstance(
+                        natrix_config["select"], list
+                    ):
+                        config["select"] = set(natrix_config["select"])
+                    if natrix_config.get("min_severity") in SEVERITY_LEVELS:
+                        config["min_severity"] = natrix_config["min_severity"]
                     # Parse rule configurations
                     if "rule_configs" in natrix_config and isinstance(
                         natrix_config["rule_configs"], dict
@@ -172,14 +378,167 @@ def read_pyproject_config() -> dict[str, Any]:
                             (project_root / path).resolve()
                             for path in natrix_config["path"]
                         ]
+                    if natrix_config.get("compiler_engine") in COMPILER_ENGINES:
+                        config["compiler_engine"] = natrix_config["compiler_engine"]
     except Exception as e:
         print(f"Warning: Error reading pyproject.toml: {e}")
 
     return config
 
 
-def parse_args() -> argparse.Namespace:
-    """Parse command line arguments."""
+def add_compiler_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options controlling how the compiler is invoked."""
+    parser.add_argument(
+        "--engine",
+        choices=COMPILER_ENGINES,
+        help=(
+            "How to invoke the compiler: run the vyper executable for each "
+            "compilation (subprocess) or call vyper's Python API (inprocess)."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always invoke the compiler instead of reusing cached outputs.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory where compiler outputs are cached (default: ~/.cache/natrix).",
+    )
+
+
+def create_cache(args: argparse.Namespace) -> CompileCache | None:
+    """Create the compiler output cache requested on the command line."""
+    if args.no_cache:
+        return None
+    return CompileCache(Path(args.cache_dir) if args.cache_dir else None)
+
+
+@dataclass
+class LintOptions:
+    """What to lint and how, merged from the command line and pyproject.toml."""
+
+    files: list[Path]
+    extra_paths: tuple[Path, ...]
+    rule_configs: dict[str, dict[str, Any]]
+    disabled_rules: set[str]
+    select: set[str] | None
+    min_severity: str | None
+    engine: str
+
+
+def resolve_lint_options(
+    args: argparse.Namespace, formatter: OutputFormatter
+) -> LintOptions:
+    """
+    Resolve the options of the lint command, exiting if they are invalid or
+    there is no file to lint.
+    """
+    RuleRegistry.discover_rules()
+
+    # Parse rule configurations from CLI
+    rule_configs: dict[str, dict[str, Any]] = {}
+    if args.rule_config:
+        for config_str in args.rule_config:
+            try:
+                rule_param, value = config_str.split("=", 1)
+                rule_name, param = rule_param.split(".", 1)
+
+                # Convert value to appropriate type if possible
+                if value.lower() == "true":
+                    value = True
+                elif value.lower() == "false":
+                    value = False
+                elif value.isdigit():
+                    value = int(value)
+                elif re.match(r"^\d+\.\d+$", value):
+                    value = float(value)
+
+                # Initialize rule configuration dictionary if it doesn't exist
+                if rule_name not in rule_configs:
+                    rule_configs[rule_name] = {}
+
+                rule_configs[rule_name][param] = value
+            except ValueError:
+                formatter.print(f"Invalid rule configuration format: {config_str}")
+                formatter.print("Expected format: RuleName.param=value")
+                sys.exit(1)
+
+    # Read config from pyproject.toml
+    pyproject_config = read_pyproject_config()
+
+    # Merge configurations, with CLI taking precedence
+    merged_rule_configs = pyproject_config.get("rule_configs", {}).copy()
+    for rule_name, params in rule_configs.items():
+        if rule_name not in merged_rule_configs:
+            merged_rule_configs[rule_name] = {}
+        merged_rule_configs[rule_name].update(params)
+
+    # Combine disabled rules from CLI and pyproject.toml
+    disabled_rules = pyproject_config["disabled_rules"]
+    if args.disable:
+        disabled_rules.update(args.disable)
+
+    # The CLI selection replaces the one from pyproject.toml
+    select = set(args.select) if args.select else pyproject_config["select"]
+    min_severity = args.min_severity or pyproject_config["min_severity"]
+
+    if select is not None:
+        known_codes = {
+            getattr(rule_class, "CODE", None)
+            for rule_class in RuleRegistry.get_rule_classes().values()
+        }
+        for code in sorted(select - known_codes):
+            formatter.print(f"Warning: unknown rule code '{code}' in selection.")
+
+    # Combine paths from CLI and pyproject.toml
+    extra_paths = pyproject_config.get("path", [])
+    if args.path:
+        extra_paths.extend(args.path)
+
+    # Handle files
+    if args.files:
+        all_vy_files = []
+        for path in args.files:
+            path = Path(path)
+            if path.is_file() and path.suffix in VYPER_EXTENSIONS:
+                all_vy_files.append(path)
+            elif path.is_dir():
+                dir_vy_files = find_vy_files(path)
+                if not dir_vy_files:
+                    formatter.print(f"No Vyper files found in the directory: {path}")
+                all_vy_files.extend(dir_vy_files)
+            else:
+                formatter.print(
+                    f"Provided path is not a valid Vyper file or directory: {path}"
+                )
+
+        if not all_vy_files:
+            formatter.print("No valid Vyper files to lint.")
+            sys.exit(1)
+    else:
+        # If no paths are provided, search for Vyper files in the current
+        # directory recursively
+        all_vy_files = find_vy_files(Path())
+
+        if not all_vy_files:
+            formatter.print("No Vyper files found in the current directory.")
+            sys.exit(1)
+
+    return LintOptions(
+        files=all_vy_files,
+        extra_paths=tuple(Path(p) for p in extra_paths),
+        rule_configs=merged_rule_configs,
+        disabled_rules=disabled_rules,
+        select=select,
+        min_severity=min_severity,
+        engine=args.engine or pyproject_config["compiler_engine"],
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments, `sys.argv` unless `argv` is given."""
     parser = argparse.ArgumentParser(description="A linter for Vyper Smart Contracts.")
 
     # Add version flag at the top level
@@ -207,6 +566,18 @@ def parse_args() -> argparse.Namespace:
         nargs="+",
         help="List of rule codes to disable (e.g., --disable NTX3 NTX7).",
     )
+    lint_parser.add_argument(
+        "-s",
+        "--select",
+        type=str,
+        nargs="+",
+        help="Only run the given rule codes (e.g., --select NTX1 NTX7).",
+    )
+    lint_parser.add_argument(
+        "--min-severity",
+        choices=SEVERITY_LEVELS,
+        help="Only run rules with at least the given severity.",
+    )
     lint_parser.add_argument(
         "-c",
         "--rule-config",
@@ -237,6 +608,27 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Output issues in JSON format.",
     )
+    lint_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of modules to compile and lint concurrently (default: 1).",
+    )
+    lint_parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep running, and relint the files affected by every change.",
+    )
+    lint_parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="How often to look for changes in watch mode (default: 1.0).",
+    )
+    add_compiler_arguments(lint_parser)
 
     # Create the codegen subcommand parser
     codegen_parser = subparsers.add_parser("codegen", help="Code generation utilities")
@@ -259,6 +651,7 @@ def parse_args() -> argparse.Namespace:
             "(e.g., -p /path/to/libs /another/path)."
         ),
     )
+    add_compiler_arguments(exports_parser)
 
     # Create the call_graph sub-subcommand
     call_graph_parser = codegen_subparsers.add_parser(
@@ -278,20 +671,77 @@ def parse_args() -> argparse.Namespace:
             "(e.g., -p /path/to/libs /another/path)."
         ),
     )
+    add_compiler_arguments(call_graph_parser)
+
+    # Create the serve subcommand parser
+    serve_parser = subparsers.add_parser(
+        "serve", help="Run a server answering lint and codegen requests"
+    )
+    serve_transport = serve_parser.add_mutually_exclusive_group()
+    serve_transport.add_argument(
+        "--socket",
+        type=str,
+        help="Unix socket to listen on (default: server.sock in the cache directory).",
+    )
+    serve_transport.add_argument(
+        "--stdio",
+        action="store_true",
+        help="Read requests from stdin and write responses to stdout instead.",
+    )
+    serve_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of modules to compile and lint concurrently (default: 1).",
+    )
+    add_compiler_arguments(serve_parser)
+
+    # Create the lsp subcommand parser
+    lsp_parser = subparsers.add_parser(
+        "lsp", help="Run a language server on stdio, for editors"
+    )
+    lsp_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.3,
+        metavar="SECONDS",
+        help="How long to wait after an edit before relinting (default: 0.3).",
+    )
+    add_compiler_arguments(lsp_parser)
+
+    # Create the client subcommand parser
+    client_parser = subparsers.add_parser(
+        "client",
+        help="Run a natrix command on the server, or locally if none is running",
+    )
+    client_parser.add_argument(
+        "--socket",
+        type=str,
+        help="Unix socket of the server (default: server.sock in the cache directory).",
+    )
+    client_parser.add_argument(
+        "natrix_args",
+        nargs=argparse.REMAINDER,
+        help="The natrix command to run (e.g., lint contracts/ --json).",
+    )
 
     # If no command is specified, default to lint for backward compatibility
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     if args.command is None and not args.version:
         # Re-parse with lint as default command
-        sys.argv.insert(1, "lint")
-        args = parser.parse_args()
+        if argv is None:
+            sys.argv.insert(1, "lint")
+        else:
+            argv = ["lint", *argv]
+        args = parser.parse_args(argv)
 
     return args
 
 
-def main() -> None:
-    """Main entry point for the linter."""
-    args = parse_args()
+def main(argv: list[str] | None = None) -> None:
+    """Main entry point for the linter, `argv` defaults to `sys.argv`."""
+    args = parse_args(argv)
 
     if args.version:
         print(f"natrix v{__version__}")
@@ -299,11 +749,18 @@ def main() -> None:
 
     # Handle codegen command
     if args.command == "codegen":
+        if args.codegen_command in ("exports", "call_graph"):
+            # Codegen shares the compiler cache with the linter
+            cache = create_cache(args)
+            engine = args.engine or read_pyproject_config()["compiler_engine"]
+
         if args.codegen_command == "exports":
             # Get extra paths if provided
             extra_paths = tuple(Path(p) for p in args.path) if args.path else ()
             # Generate and print exports
-            exports = generate_exports(Path(args.file_path), extra_paths)
+            exports = generate_exports(
+                Path(args.file_path), extra_paths, cache=cache, engine=engine
+            )
             print(exports)
             sys.exit(0)
         elif args.codegen_command == "call_graph":
@@ -320,7 +777,11 @@ def main() -> None:
 
             # Generate and print call graph
             call_graph = generate_call_graph(
-                Path(file_path_str), extra_paths, target_function
+                Path(file_path_str),
+                extra_paths,
+                target_function,
+                cache=cache,
+                engine=engine,
             )
             print(call_graph)
             sys.exit(0)
@@ -328,6 +789,58 @@ def main() -> None:
             print("Error: No codegen subcommand specified")
             sys.exit(1)
 
+    if args.command == "serve":
+        # The server and client are only loaded when used
+        from natrix.server import (
+            NatrixServer,
+            default_socket_path,
+            serve_stdio,
+            serve_unix,
+        )
+
+        server = NatrixServer(
+            cache=create_cache(args),
+            jobs=max(args.jobs, 1),
+            engine=args.engine or read_pyproject_config()["compiler_engine"],
+        )
+        try:
+            if args.stdio:
+                serve_stdio(server)
+            else:
+                socket_path = (
+                    Path(args.socket) if args.socket else default_socket_path()
+                )
+                print(f"Listening on {socket_path} (press Ctrl+C to stop)")
+                serve_unix(server, socket_path)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.command == "lsp":
+        from natrix.lsp import serve_lsp
+
+        if args.debounce < 0:
+            print("Error: --debounce must be a non-negative number of seconds.")
+            sys.exit(1)
+        sys.exit(
+            serve_lsp(
+                cache=create_cache(args), engine=args.engine, debounce=args.debounce
+            )
+        )
+
+    if args.command == "client":
+        from natrix.server import default_socket_path, run_client
+
+        natrix_args = args.natrix_args
+        # Allow separating the command from the client options with --
+        if natrix_args[:1] == ["--"]:
+            natrix_args = natrix_args[1:]
+        socket_path = Path(args.socket) if args.socket else default_socket_path()
+        sys.exit(run_client(natrix_args, socket_path))
+
     # Handle lint command (default behavior)
     # Ensure all rules are discovered
     RuleRegistry.discover_rules()
@@ -345,104 +858,72 @@ def main() -> None:
     # Create the output formatter
     formatter = OutputFormatter(json_mode=args.json)
 
-    # Parse rule configurations from CLI
-    rule_configs: dict[str, dict[str, Any]] = {}
-    if args.rule_config:
-        for config_str in args.rule_config:
-            try:
-                rule_param, value = config_str.split("=", 1)
-                rule_name, param = rule_param.split(".", 1)
-
-                # Convert value to appropriate type if possible
-                if value.lower() == "true":
-                    value = True
-                elif value.lower() == "false":
-                    value = False
-                elif value.isdigit():
-                    value = int(value)
-                elif re.match(r"^\d+\.\d+$", value):
-                    value = float(value)
-
-                # Initialize rule configuration dictionary if it doesn't exist
-                if rule_name not in rule_configs:
-                    rule_configs[rule_name] = {}
-
-                rule_configs[rule_name][param] = value
-            except ValueError:
-                formatter.print(f"Invalid rule configuration format: {config_str}")
-                formatter.print("Expected format: RuleName.param=value")
-                sys.exit(1)
-
-    # Read config from pyproject.toml
-    pyproject_config = read_pyproject_config()
+    if args.watch and args.watch_interval <= 0:
+        print("Error: --watch-interval must be a positive number of seconds.")
+        sys.exit(1)
 
-    # Merge configurations, with CLI taking precedence
-    merged_rule_configs = pyproject_config.get("rule_configs", {}).copy()
-    for rule_name, params in rule_configs.items():
-        if rule_name not in merged_rule_configs:
-            merged_rule_configs[rule_name] = {}
-        merged_rule_configs[rule_name].update(params)
-
-    # Initialize rules once with the merged configurations
-    RuleRegistry.get_rules(merged_rule_configs)
-
-    # Combine disabled rules from CLI and pyproject.toml
-    disabled_rules = pyproject_config["disabled_rules"]
-    if args.disable:
-        disabled_rules.update(args.disable)
-
-    # Combine paths from CLI and pyproject.toml
-    extra_paths = pyproject_config.get("path", [])
-    if args.path:
-        extra_paths.extend(args.path)
+    options = resolve_lint_options(args, formatter)
 
-    # Handle files
-    if args.files:
-        all_vy_files = []
-        for path in args.files:
-            path = Path(path)
-            if path.is_file() and path.suffix in VYPER_EXTENSIONS:
-                all_vy_files.append(path)
-            elif path.is_dir():
-                dir_vy_files = find_vy_files(path)
-                if not dir_vy_files:
-                    formatter.print(f"No Vyper files found in the directory: {path}")
-                all_vy_files.extend(dir_vy_files)
-            else:
-                formatter.print(
-                    f"Provided path is not a valid Vyper file or directory: {path}"
-                )
-
-        if not all_vy_files:
-            formatter.print("No valid Vyper files to lint.")
-            sys.exit(1)
-    else:
-        # If no paths are provided, search for Vyper files in the current
-        # directory recursively
-        all_vy_files = find_vy_files(Path())
+    # Initialize the selected rules once with the merged configurations,
+    # the other ones are never instantiated
+    RuleRegistry.get_rules(
+        options.rule_configs,
+        select=options.select,
+        disabled_rules=options.disabled_rules,
+        min_severity=options.min_severity,
+    )
 
-        if not all_vy_files:
-            formatter.print("No Vyper files found in the current directory.")
-            sys.exit(1)
+    # Set up the compiler output cache unless disabled
+    cache = create_cache(args)
 
     # Create ProjectContext with all files
     formatter.print("Building project dependency graph...")
     project_context = ProjectContext(
-        all_vy_files,
-        extra_paths=tuple(Path(p) if isinstance(p, str) else p for p in extra_paths),
+        options.files,
+        extra_paths=options.extra_paths,
+        cache=cache,
+        jobs=max(args.jobs, 1),
+        engine=options.engine,
+        # Only compile what the enabled rules consume
+        outputs=RuleRegistry.get_required_outputs(
+            options.disabled_rules,
+            select=options.select,
+            min_severity=options.min_severity,
+        ),
     )
+    if cache is not None:
+        formatter.print(cache.summary())
 
     # Collect all issues from all files
-    all_issues: list[Issue] = []
-    for file in all_vy_files:
-        file_issues = lint_file(
-            Path(file).resolve(), project_context, formatter, disabled_rules
-        )
-        all_issues.extend(file_issues)
+    all_issues = lint_files(
+        [file.resolve() for file in options.files],
+        project_context,
+        formatter,
+        options.disabled_rules,
+        jobs=max(args.jobs, 1),
+    )
 
     # Output issues
     formatter.print_issues(all_issues)
 
+    if args.watch:
+        formatter.print("\nWatching for changes... (press Ctrl+C to stop)")
+        # Watch the linted directories for new files as well
+        watcher = FileWatcher(
+            [Path(path) for path in args.files] if args.files else [Path()],
+            VYPER_EXTENSIONS,
+        )
+        all_issues = watch_and_lint(
+            watcher,
+            project_context,
+            formatter,
+            all_issues,
+            options.disabled_rules,
+            jobs=max(args.jobs, 1),
+            interval=args.watch_interval,
+        )
+        sys.exit(1 if all_issues else 0)
+
     # Print summary and exit
     formatter.print_summary(bool(all_issues))
     sys.exit(1 if all_issues else 0)
@@ -1,50 +1,101 @@
 from __future__ import annotations
 
+import heapq
+from array import array
+from bisect import bisect_left
 from dataclasses import dataclass
 from functools import cached_property
 from typing import TYPE_CHECKING, Any
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Callable, Iterable, Iterator
+
+    # Retrieves a field from a node dict, see `field_getter`
+    FieldGetter = Callable[..., Any]
 
 
 class Node:
-    def __init__(self, node_dict: dict[str, Any], parent: Node | None = None):
+    # A module has thousands of nodes, slots keep them small and make
+    # attribute access faster. The subclasses for specific node types don't
+    # define slots, so they can keep using `cached_property`.
+    __slots__ = (
+        "_children",
+        "_immutable_vars",
+        "_module_node",
+        "ast_type",
+        "enter",
+        "exit",
+        "index",
+        "node_dict",
+        "parent",
+    )
+
+    def __init__(
+        self,
+        node_dict: dict[str, Any],
+        parent: Node | None = None,
+        *,
+        lazy: bool = False,
+    ):
+        """
+        Wrap `node_dict`. When creating the root of a tree (no `parent`), the
+        whole tree is indexed. With `lazy`, the nodes beneath the root are
+        only wrapped when they are first accessed, otherwise they are all
+        wrapped upfront.
+        """
         self.node_dict = node_dict
         self.parent = parent
-        self.children: list[Node] = []
-        self._cache_descendants: list[Node] | None = None
+        self._children: list[Node] | None = None
+        ast_type = node_dict.get("ast_type")
+        self.ast_type: str | None = ast_type if isinstance(ast_type, str) else None
+
+        # Lazily computed, see the corresponding properties
+        self._module_node: Node | None = None
+        self._immutable_vars: set[str] | None = None
 
-        self._build_children()
+        # Position of the node in its tree, see `NodeIndex`
+        self.index: NodeIndex | None = None
+        self.enter = 0
+        self.exit = 0
+
+        if parent is None:
+            NodeIndex(self, lazy=lazy)
 
     @classmethod
-    def from_dict(cls, node_dict: dict[str, Any], parent: Node | None = None) -> Node:
+    def from_dict(
+        cls,
+        node_dict: dict[str, Any],
+        parent: Node | None = None,
+        *,
+        lazy: bool = False,
+    ) -> Node:
         """
         Factory method that decides which subclass to instantiate
         based on the AST node type.
         """
         ast_type = node_dict.get("ast_type")
         if ast_type == "FunctionDef":
-            return FunctionDefNode(node_dict, parent=parent)
+            return FunctionDefNode(node_dict, parent=parent, lazy=lazy)
         elif ast_type == "Module":
-            return ModuleNode(node_dict, parent=parent)
-        return cls(node_dict, parent=parent)
-
-    def _build_children(self) -> None:
-        for _, value in self.node_dict.items():
-            if isinstance(value, dict) and "ast_type" in value:
-                child_node = Node.from_dict(value, parent=self)
-                self.children.append(child_node)
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict) and "ast_type" in item:
-                        child_node = Node.from_dict(item, parent=self)
-                        self.children.append(child_node)
-
-    @cached_property
-    def ast_type(self) -> str | None:
-        value = self.get("ast_type")
-        return value if isinstance(value, str) else None
+            return ModuleNode(node_dict, parent=parent, lazy=lazy)
+        return cls(node_dict, parent=parent, lazy=lazy)
+
+    @property
+    def children(self) -> list[Node]:
+        """The child nodes, wrapped on first access."""
+        if self._children is None:
+            if self.index is not None:
+                index = self.index
+                self._children = [
+                    index.node_at(position)
+                    for position in index.child_positions(self.enter)
+                ]
+            else:
+                self._children = [
+                    Node.from_dict(child_dict, parent=self)
+                    for child_dict in _child_dicts(self.node_dict)
+                ]
+        return self._children
 
     def __repr__(self) -> str:
         match self.ast_type:
@@ -73,10 +124,22 @@ class Node:
         if isinstance(node_type, str):
             node_type = (node_type,)
 
-        if self.parent.ast_type in node_type:
-            return self.parent
+        ancestor: Node | None = self.parent
+        while ancestor is not None and ancestor.ast_type not in node_type:
+            ancestor = ancestor.parent
+        return ancestor
 
-        return self.parent.get_ancestor(node_type)
+    def is_ancestor_of(self, node: Node) -> bool:
+        """
+        Return whether `node` is a descendant of this node, in constant time.
+        """
+        if self.index is None or self.index is not node.index:
+            # Not part of the same indexed tree, look at the parents
+            ancestor = node.parent
+            while ancestor is not None and ancestor is not self:
+                ancestor = ancestor.parent
+            return ancestor is not None
+        return self.enter < node.enter < self.exit
 
     def get_children(
         self,
@@ -101,47 +164,153 @@ class Node:
 
         A descendant is any node which exists within the AST beneath the given node.
         """
+        if node_type is not None and self.index is not None:
+            # Only look at the nodes of the requested types
+            if isinstance(node_type, str):
+                node_type = (node_type,)
+            start = self.enter if include_self else self.enter + 1
+            matches = self.index.find(node_type, start, self.exit)
+            return _apply_filters(matches, None, filters, reverse)
+
         ret = self._get_descendants(include_self)
         return _apply_filters(ret, node_type, filters, reverse)
 
+    def iter_descendants(
+        self,
+        node_type: str | tuple[str, ...] | None = None,
+        filters: dict[str, Any] | None = None,
+        include_self: bool = False,
+        reverse: bool = False,
+    ) -> Iterator[Node]:
+        """
+        Lazily yield the descendants matching the given type/filters, in
+        preorder (or reverse preorder).
+
+        Unlike `get_descendants`, no list is built: stopping early only pays
+        for the nodes visited, see `has_descendant`.
+        """
+        if isinstance(node_type, str):
+            node_type = (node_type,)
+
+        start = self.enter if include_self else self.enter + 1
+        nodes: Iterator[Node]
+        if self.index is not None:
+            index = self.index
+            positions: Iterable[int]
+            if node_type is not None:
+                # Only look at the nodes of the requested types
+                positions = index.iter_positions(node_type, start, self.exit, reverse)
+                node_type = None
+            elif reverse:
+                positions = range(self.exit - 1, start - 1, -1)
+            else:
+                positions = range(start, self.exit)
+            nodes = map(index.node_at, positions)
+        else:
+            nodes = self._iter_unindexed(include_self, reverse)
+
+        if node_type is None and not filters:
+            return nodes
+        return _iter_filtered(nodes, node_type, filters)
+
+    def has_descendant(
+        self,
+        node_type: str | tuple[str, ...] | None = None,
+        filters: dict[str, Any] | None = None,
+    ) -> bool:
+        """
+        Return whether any descendant matches the given type/filters,
+        stopping at the first match.
+        """
+        return next(self.iter_descendants(node_type, filters), None) is not None
+
+    def _iter_unindexed(self, include_self: bool, reverse: bool) -> Iterator[Node]:
+        # Iterative traversal of a node outside of an indexed tree
+        if not reverse:
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if include_self or node is not self:
+                    yield node
+                stack.extend(reversed(node.children))
+            return
+
+        # Reverse preorder is a postorder visiting the last child first
+        expanded_stack: list[tuple[Node, bool]] = [(self, False)]
+        while expanded_stack:
+            node, expanded = expanded_stack.pop()
+            if expanded:
+                if include_self or node is not self:
+                    yield node
+            else:
+                expanded_stack.append((node, True))
+                expanded_stack.extend([(child, False) for child in node.children])
+
     def _get_descendants(self, include_self: bool = True) -> list[Node]:
-        if self._cache_descendants is None:
-            nodes = []
-            if include_self:
-                nodes.append(self)
-            for child in self.children:
-                nodes.extend(child._get_descendants(include_self=True))
-            self._cache_descendants = nodes
-        if self._cache_descendants is None:
-            return []
-        return self._cache_descendants
+        start = self.enter if include_self else self.enter + 1
+        if self.index is not None:
+            # The descendants are contiguous in preorder
+            return self.index.nodes_between(start, self.exit)
+
+        # Iterative pre-order traversal of a node outside of an indexed tree
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(reversed(node.children))
+        return nodes if include_self else nodes[1:]
+
+    @property
+    def node_id(self) -> int | None:
+        """The id the compiler assigned to this node."""
+        return self.node_dict.get("node_id")
+
+    def get_node_by_id(self, node_id: int, source_id: int | None = None) -> Node | None:
+        """
+        Return the node of this node's tree with the given compiler-assigned
+        `node_id`, in constant time.
+
+        Node ids are only unique within a source file: if `source_id` is
+        given (e.g. from the `decl_node` of a `variable_reads` entry), nodes
+        from another file are not looked up.
+        """
+        module_node = self.module_node
+        if source_id is not None and source_id != module_node.get("source_id"):
+            return None
+        if module_node.index is None:
+            # Not an indexed tree, look at every node
+            return next(
+                module_node.iter_descendants(
+                    filters={"node_id": node_id}, include_self=True
+                ),
+                None,
+            )
+        return module_node.index.node_by_id(node_id)
 
     def get(self, field_str: str, default: Any = None) -> Any:
         """
         Safely retrieve nested properties from `node_dict`.
         `field_str` may include dots to retrieve nested keys.
         """
-        obj = self.node_dict
-        for key in field_str.split("."):
-            if isinstance(obj, dict):
-                obj = obj.get(key, default)
-            else:
-                return default
-            if obj is None:
-                return default
-        return obj
+        getter = _field_getters.get(field_str)
+        if getter is None:
+            getter = field_getter(field_str)
+        return getter(self.node_dict, default)
 
-    @cached_property
+    @property
     def module_node(self) -> Node:
         """
         Get the root module node from any node in the AST.
         """
-        module_node = self
-        while module_node.parent is not None:
-            module_node = module_node.parent
-        return module_node
-
-    @cached_property
+        if self._module_node is None:
+            module_node = self
+            while module_node.parent is not None:
+                module_node = module_node.parent
+            self._module_node = module_node
+        return self._module_node
+
+    @property
     def immutable_vars(self) -> set[str]:
         """
         Get all immutable variables from the module.
@@ -149,18 +318,198 @@ class Node:
         Returns:
             set: A set of variable names that are declared as immutable.
         """
-        # Find all variable declarations in the module
-        var_decls = self.module_node.get_descendants(node_type="VariableDecl")
+        # Computed once per module and stored on the module node
+        module_node = self.module_node
+        if module_node._immutable_vars is None:
+            # Find all variable declarations in the module
+            var_decls = module_node.get_descendants(node_type="VariableDecl")
 
-        # Extract immutable variables
-        immutable_vars = set()
-        for decl in var_decls:
-            if decl.get("is_immutable") is True:
-                var_name = decl.get("target.id")
-                if var_name:
-                    immutable_vars.add(var_name)
+            # Extract immutable variables
+            immutable_vars = set()
+            for decl in var_decls:
+                if decl.get("is_immutable") is True:
+                    var_name = decl.get("target.id")
+                    if var_name:
+                        immutable_vars.add(var_name)
 
-        return immutable_vars
+            module_node._immutable_vars = immutable_vars
+
+        return module_node._immutable_vars
+
+
+class NodeIndex:
+    """
+    Index of the nodes of a tree by type, built once when its root is.
+
+    Nodes are numbered in preorder: `node.enter` is the position of the node
+    and `node.exit` the position right after its last descendant. The
+    descendants of a node are therefore the nodes positioned strictly
+    between the two, which makes subtree queries a range lookup.
+
+    The index is built from the node dicts, so nodes can be wrapped lazily:
+    `node_at` wraps a node (and its missing ancestors) on first access.
+    """
+
+    __slots__ = (
+        "_positions_by_node_id",
+        "_positions_by_type",
+        "dicts",
+        "exits",
+        "nodes",
+        "parents",
+    )
+
+    def __init__(self, root: Node, lazy: bool = False):
+        dicts: list[dict[str, Any]] = []
+        parents: list[int] = []
+        positions_by_type: dict[str, list[int]] = {}
+
+        # Iterative pre-order traversal, children are pushed in reverse
+        # so that they are numbered in their original order
+        stack: list[tuple[dict[str, Any], int]] = [(root.node_dict, -1)]
+        while stack:
+            node_dict, parent = stack.pop()
+            position = len(dicts)
+            dicts.append(node_dict)
+            parents.append(parent)
+            ast_type = node_dict.get("ast_type")
+            if isinstance(ast_type, str):
+                positions = positions_by_type.get(ast_type)
+                if positions is None:
+                    positions_by_type[ast_type] = [position]
+                else:
+                    positions.append(position)
+            children = _child_dicts(node_dict)
+            if children:
+                children.reverse()
+                stack.extend([(child_dict, position) for child_dict in children])
+
+        # A subtree ends where the subtree of its last child ends. Children
+        # come after their parent, so going backwards every child is done
+        # before its parent
+        size = len(dicts)
+        exits = list(range(1, size + 1))
+        for position in range(size - 1, 0, -1):
+            parent = parents[position]
+            if exits[position] > exits[parent]:
+                exits[parent] = exits[position]
+
+        self.dicts = dicts
+        self._positions_by_type = positions_by_type
+        # Built on the first lookup by node_id, see `node_by_id`
+        self._positions_by_node_id: dict[int, int] | None = None
+        # Compact arrays, they hold an entry per node
+        self.parents = array("i", parents)
+        self.exits = array("i", exits)
+
+        self.nodes: list[Node | None] = [None] * size
+        self._attach(root, 0)
+
+        if not lazy:
+            # Parents come first in preorder, so each node's parent is
+            # already wrapped (and its children list started) when the
+            # node is
+            nodes = self.nodes
+            root._children = []
+            for position in range(1, size):
+                parent_node = nodes[parents[position]]
+                node = Node.from_dict(dicts[position], parent=parent_node)
+                node.index = self
+                node.enter = position
+                node.exit = exits[position]
+                node._children = []
+                nodes[position] = node
+                parent_node._children.append(node)  # type: ignore[union-attr]
+
+    def _attach(self, node: Node, position: int) -> None:
+        node.index = self
+        node.enter = position
+        node.exit = self.exits[position]
+        self.nodes[position] = node
+
+    def _wrap(self, position: int) -> Node:
+        parent = self.nodes[self.parents[position]]
+        node = Node.from_dict(self.dicts[position], parent=parent)
+        self._attach(node, position)
+        return node
+
+    def node_at(self, position: int) -> Node:
+        """Return the node at `position`, wrapping it if needed."""
+        node = self.nodes[position]
+        if node is not None:
+            return node
+
+        # Wrap the missing ancestors first, from the top
+        missing = [position]
+        ancestor = self.parents[position]
+        while self.nodes[ancestor] is None:
+            missing.append(ancestor)
+            ancestor = self.parents[ancestor]
+        for missing_position in reversed(missing[1:]):
+            self._wrap(missing_position)
+        return self._wrap(position)
+
+    def node_by_id(self, node_id: int) -> Node | None:
+        """Return the node with the compiler-assigned `node_id`, if any."""
+        if self._positions_by_node_id is None:
+            # Operator nodes of the same kind share their node_id, the first
+            # one is kept
+            positions_by_node_id: dict[int, int] = {}
+            for dict_position, node_dict in enumerate(self.dicts):
+                dict_node_id = node_dict.get("node_id")
+                if dict_node_id is not None:
+                    positions_by_node_id.setdefault(dict_node_id, dict_position)
+            self._positions_by_node_id = positions_by_node_id
+
+        position = self._positions_by_node_id.get(node_id)
+        return None if position is None else self.node_at(position)
+
+    def iter_positions(
+        self, node_type: tuple[str, ...], start: int, end: int, reverse: bool = False
+    ) -> Iterator[int]:
+        """
+        Yield the positions of the nodes of the given types in [`start`,
+        `end`), in preorder (or reverse preorder).
+        """
+        ranges = []
+        for ast_type in node_type:
+            positions = self._positions_by_type.get(ast_type)
+            if positions:
+                lo = bisect_left(positions, start)
+                hi = bisect_left(positions, end, lo)
+                if lo < hi:
+                    indices = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+                    ranges.append(map(positions.__getitem__, indices))
+
+        if not ranges:
+            return iter(())
+        if len(ranges) == 1:
+            return ranges[0]
+        return heapq.merge(*ranges, reverse=reverse)
+
+    def nodes_between(self, start: int, end: int) -> list[Node]:
+        """Return the nodes positioned in [`start`, `end`), in preorder."""
+        nodes = self.nodes[start:end]
+        if None in nodes:
+            return [self.node_at(position) for position in range(start, end)]
+        return nodes  # type: ignore[return-value]
+
+    def child_positions(self, position: int) -> list[int]:
+        """Return the positions of the children of the node at `position`."""
+        positions = []
+        child = position + 1
+        end = self.exits[position]
+        while child < end:
+            positions.append(child)
+            child = self.exits[child]
+        return positions
+
+    def find(self, node_type: tuple[str, ...], start: int, end: int) -> list[Node]:
+        """
+        Return the nodes of the given types positioned in [`start`, `end`),
+        in preorder.
+        """
+        return list(map(self.node_at, self.iter_positions(node_type, start, end)))
 
 
 @dataclass()
@@ -303,6 +652,61 @@ class FunctionDefNode(Node):
         return f"<FunctionDef {self.get('name')}>"
 
 
+# Getters compiled by `field_getter`, by path
+_field_getters: dict[str, FieldGetter] = {}
+
+
+def field_getter(field_str: str) -> FieldGetter:
+    """
+    Return a function retrieving the (possibly dotted) `field_str` from a node
+    dict, like `Node.get` does.
+
+    The path is only parsed once, getters are cached by path, so hot loops can
+    look up fields without splitting strings:
+
+        get_func_name = field_getter("func.value.id")
+        names = [get_func_name(call.node_dict) for call in calls]
+    """
+    getter = _field_getters.get(field_str)
+    if getter is not None:
+        return getter
+
+    keys = tuple(field_str.split("."))
+
+    # Specialized for the common short paths
+    if len(keys) == 1:
+        (key,) = keys
+
+        def getter(obj: dict[str, Any], default: Any = None) -> Any:
+            value = obj.get(key, default)
+            return default if value is None else value
+
+    elif len(keys) == 2:
+        first, second = keys
+
+        def getter(obj: dict[str, Any], default: Any = None) -> Any:
+            value = obj.get(first, default)
+            if not isinstance(value, dict):
+                return default
+            value = value.get(second, default)
+            return default if value is None else value
+
+    else:
+
+        def getter(obj: dict[str, Any], default: Any = None) -> Any:
+            value: Any = obj
+            for key in keys:
+                if not isinstance(value, dict):
+                    return default
+                value = value.get(key, default)
+                if value is None:
+                    return default
+            return value
+
+    _field_getters[field_str] = getter
+    return getter
+
+
 def _apply_filters(
     iterable: Iterable[Node],
     node_type: str | tuple[str, ...] | None = None,
@@ -312,18 +716,37 @@ def _apply_filters(
     """
     Generic filtering utility for Node lists.
     """
+    results = list(_iter_filtered(iterable, node_type, filters))
+    if reverse:
+        results.reverse()
+    return results
+
+
+def _iter_filtered(
+    iterable: Iterable[Node],
+    node_type: str | tuple[str, ...] | None = None,
+    filters: dict[str, Any] | None = None,
+) -> Iterator[Node]:
+    """
+    Lazily yield the nodes matching the given type/filters.
+    """
     if node_type is not None and isinstance(node_type, str):
         node_type = (node_type,)
 
-    results = []
+    # Resolve the getters once rather than for every node
+    compiled_filters = [
+        (field_getter(attr_name), expected_value)
+        for attr_name, expected_value in (filters or {}).items()
+    ]
+
     for node in iterable:
         if node_type and node.ast_type not in node_type:
             continue
 
-        if filters:
+        if compiled_filters:
             match = True
-            for attr_name, expected_value in filters.items():
-                attr_value = node.get(attr_name)
+            for getter, expected_value in compiled_filters:
+                attr_value = getter(node.node_dict)
                 if isinstance(expected_value, set):
                     if attr_value not in expected_value:
                         match = False
@@ -335,9 +758,17 @@ def _apply_filters(
             if not match:
                 continue
 
-        results.append(node)
+        yield node
 
-    if reverse:
-        results.reverse()
 
-    return results
+def _child_dicts(node_dict: dict[str, Any]) -> list[dict[str, Any]]:
+    """Return the dicts of the child nodes of `node_dict`, in order."""
+    children = []
+    for value in node_dict.values():
+        if isinstance(value, dict) and "ast_type" in value:
+            children.append(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and "ast_type" in item:
+                    children.append(item)
+    return children
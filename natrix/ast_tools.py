@@ -3,23 +3,66 @@ from __future__ import annotations
 import ast
 import io
 import json
+import os
 import re
+import shutil
 import subprocess
+import tempfile
+import threading
 import tokenize
+import warnings
+from dataclasses import dataclass
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
+from natrix import interning
+
 if TYPE_CHECKING:
+    from collections.abc import Callable, Collection, Sequence
+
     from natrix.ast_node import Node
+    from natrix.cache import CompileCache
 
 SUPPORTED_VYPER_VERSION_PATTERN = re.compile(r"^0\.4\.\d+$")
 
+# Available ways of invoking the compiler:
+# - "subprocess" runs the `vyper` executable for every compilation
+# - "inprocess" imports vyper once and calls its compile entry points
+COMPILER_ENGINES = ("subprocess", "inprocess")
+
+# The vyper compiler keeps global state while compiling, so in-process
+# compilations must not run concurrently.
+_inprocess_lock = threading.Lock()
+
+# Parts of a module that `parse_file` can produce:
+# - "ast": the annotated AST along with the resolved imports
+# - "comments": the source code comments, which the compiler discards
+# - "metadata": the compiler metadata, and the ABI that comes along with it
+PARSE_OUTPUTS = ("ast", "comments", "metadata")
+
+# How often a compiler subprocess is checked for cancellation, in seconds
+_CANCEL_POLL_INTERVAL = 0.02
+
+# Output formats that are named differently in the compiler's Python API
+_INPROCESS_OUTPUT_FORMATS = {"ast": "ast_dict", "annotated_ast": "annotated_ast_dict"}
 
-def _parse_comments(file_path: Path) -> list[dict[str, Any]]:
-    """Parse comments from Vyper source code file."""
+# Toolchains probed by this process, see `get_toolchain`
+_toolchains: dict[tuple[Any, ...], Toolchain] = {}
+_toolchain_lock = threading.Lock()
+
+
+class CompilationCancelledError(Exception):
+    """A compilation was aborted because its result is no longer needed."""
+
+
+def _parse_comments(
+    file_path: Path, source_code: str | None = None
+) -> list[dict[str, Any]]:
+    """Parse comments from Vyper source code file, or from its `source_code`."""
     comments = []
-    with file_path.open("r", encoding="utf-8") as f:
-        source_code = f.read()
+    if source_code is None:
+        with file_path.open("r", encoding="utf-8") as f:
+            source_code = f.read()
     g = io.StringIO(source_code).readline
     for tok in tokenize.generate_tokens(g):
         if tok.type == tokenize.COMMENT:
@@ -39,10 +82,13 @@ def _parse_comments(file_path: Path) -> list[dict[str, Any]]:
     return comments
 
 
-def _check_vyper_version() -> None:
+def _check_vyper_version() -> str:
     """
     Check if vyper is installed and at a supported version.
     Raises an exception if vyper is not available or not at a supported version.
+
+    Returns:
+        The version of the installed compiler
     """
     try:
         result = subprocess.run(["vyper", "--version"], capture_output=True, text=True)
@@ -57,6 +103,7 @@ def _check_vyper_version() -> None:
         version = version_match.group(1)
         if not SUPPORTED_VYPER_VERSION_PATTERN.match(version):
             raise Exception(f"Vyper version must be >= 0.4.0, found {version}")
+        return version
     except FileNotFoundError as e:
         raise Exception(
             "Vyper compiler not found. Please ensure Vyper version >= 0.4.0 "
@@ -97,32 +144,64 @@ def _obtain_default_paths() -> list[Path]:
     return default_paths
 
 
-def vyper_compile(
-    filename: Path, formatting: str, extra_paths: tuple[Path, ...] = ()
-) -> dict[str, Any] | list[dict[str, Any]]:
-    _check_vyper_version()
+def _inprocess_vyper_version() -> str | None:
+    """
+    Return the version of the vyper package importable from this interpreter,
+    or None if it is not installed or not at a supported version.
+    """
+    try:
+        import vyper
+    except ImportError:
+        return None
+
+    version_match = re.search(r"(\d+\.\d+\.\d+)", vyper.__version__)
+    if not version_match or not SUPPORTED_VYPER_VERSION_PATTERN.match(
+        version_match.group(1)
+    ):
+        return None
+    return version_match.group(1)
 
-    # Combine all paths
-    all_paths = _obtain_sys_path() + _obtain_default_paths() + list(extra_paths)
 
-    # Filter out non-existent paths as the vyper compiler will throw an error
-    valid_paths = [p for p in all_paths if p.exists()]
+def _check_cancelled(filename: Path, cancel: threading.Event | None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise CompilationCancelledError(f"Compilation of '{filename}' was cancelled")
 
-    # Convert to compiler flags (vyper expects strings)
-    path_flags = [item for p in valid_paths for item in ["-p", str(p)]]
 
-    command = ["vyper", "-f", formatting, str(filename), *path_flags]
+def _compile_subprocess(
+    filename: Path,
+    formats: list[str],
+    path_flags: tuple[str, ...],
+    cancel: threading.Event | None = None,
+) -> dict[str, Any]:
+    _check_cancelled(filename, cancel)
+    command = ["vyper", "-f", ",".join(formats), str(filename), *path_flags]
 
     process = subprocess.Popen(
         command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
     )
-    stdout, stderr = process.communicate()
+    if cancel is None:
+        stdout, stderr = process.communicate()
+    else:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=_CANCEL_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel.is_set():
+                    # Don't let an abandoned compilation hold a core
+                    process.kill()
+                    process.communicate()
+                    _check_cancelled(filename, cancel)
 
     try:
-        result = json.loads(stdout)
-        # Assert that result is either dict or list to satisfy mypy
-        assert isinstance(result, dict | list)
-        return result
+        # The compiler prints one JSON document per line, in the order
+        # the formats were requested.
+        lines = stdout.splitlines()
+        assert len(lines) == len(formats)
+        return {
+            formatting: interning.loads(line)
+            for formatting, line in zip(formats, lines, strict=True)
+        }
     except Exception as e:
         # TODO change error level
         raise Exception(
@@ -131,38 +210,458 @@ def vyper_compile(
         ) from e
 
 
-def parse_file(file_path: Path, extra_paths: tuple[Path, ...] = ()) -> dict[str, Any]:
-    ast = vyper_compile(file_path, "annotated_ast", extra_paths=extra_paths)
-    # For annotated_ast, vyper_compile returns a dict
-    assert isinstance(ast, dict)
+def _compile_inprocess(
+    filename: Path,
+    formats: list[str],
+    search_paths: tuple[Path, ...],
+    cancel: threading.Event | None = None,
+    source_code: str | None = None,
+) -> dict[str, Any]:
+    # The compiler can't be interrupted, cancellation is only noticed before
+    # and after compiling
+    _check_cancelled(filename, cancel)
+    from vyper.cli.vyper_compile import get_search_paths
+    from vyper.compiler import compile_from_file_input
+    from vyper.compiler.input_bundle import FileInput, FilesystemInputBundle
 
-    ast["comments"] = _parse_comments(file_path)
+    output_formats = [_INPROCESS_OUTPUT_FORMATS.get(f, f) for f in formats]
 
-    # For interface files (.vyi), we only compile to AST, not metadata
-    if file_path.suffix == ".vyi":
-        return ast
-
-    # Try to compile metadata, but handle InitializerException gracefully
-    # This happens when a module uses deferred initialization (uses: module_name)
     try:
-        metadata = vyper_compile(file_path, "metadata", extra_paths=extra_paths)
-        # For metadata, vyper_compile also returns a dict
-        assert isinstance(metadata, dict)
-        ast["metadata"] = metadata
+        with _inprocess_lock, warnings.catch_warnings():
+            # The command line compiler prints warnings to stderr, which
+            # natrix ignores. Don't let them leak into natrix's output.
+            warnings.simplefilter("ignore")
+            input_bundle = FilesystemInputBundle(
+                get_search_paths([str(p) for p in search_paths])
+            )
+            if source_code is None:
+                file_input = input_bundle.load_file(Path(filename))
+            else:
+                # Compile the source from memory, its relative imports are
+                # resolved from the path of the file like when loaded
+                resolved_path = Path(filename).resolve()
+                file_input = FileInput(
+                    input_bundle._generate_source_id(resolved_path),
+                    Path(filename),
+                    resolved_path,
+                    source_code,
+                )
+            output = compile_from_file_input(
+                file_input, input_bundle=input_bundle, output_formats=output_formats
+            )
+        _check_cancelled(filename, cancel)
+
+        # Round-trip through JSON so that the result is exactly what the
+        # command line compiler would print, and shares no state with vyper.
+        return {
+            formatting: interning.loads(json.dumps(output[output_format]))
+            for formatting, output_format in zip(formats, output_formats, strict=True)
+        }
+    except CompilationCancelledError:
+        raise
     except Exception as e:
-        error_str = str(e)
-        if (
-            "vyper.exceptions.InitializerException" in error_str
-            and "is used but never initialized!" in error_str
-        ):
+        # Mimic the traceback line of the command line compiler so that
+        # callers can match on the exception type regardless of the engine.
+        error = f"{type(e).__module__}.{type(e).__name__}: {e}"
+        raise Exception(
+            f"Something went wrong when compiling the vyper file '{filename}'. "
+            f"The compiler returned the following error: \n {error}"
+        ) from e
+
+
+@dataclass(frozen=True)
+class Toolchain:
+    """The compiler and import search paths used to compile Vyper files."""
+
+    engine: str
+    compiler_version: str
+    # Existing import search paths, in the order they are given to the compiler
+    search_paths: tuple[Path, ...]
+    path_flags: tuple[str, ...]
+
+
+def _executable_fingerprint(name: str) -> str | None:
+    """Identify an executable on the PATH by its location and modification time."""
+    executable = shutil.which(name)
+    if executable is None:
+        return None
+    resolved = Path(executable).resolve()
+    return f"{resolved}:{resolved.stat().st_mtime_ns}"
+
+
+def _probe_toolchain(
+    engine: str, cache: CompileCache | None
+) -> tuple[str, str, list[Path]]:
+    """
+    Probe the compiler version and the interpreter's sys.path.
+
+    Both require spawning a process, so the results are persisted in the
+    cache directory keyed by the executables involved. Later runs reuse them
+    until `python` or `vyper` are replaced or upgraded.
+    """
+    version = None
+    if engine == "inprocess":
+        # Importing vyper is cheap compared to spawning a process,
+        # so the in-process version is never persisted.
+        version = _inprocess_vyper_version()
+        if version is None:
+            # vyper isn't importable from natrix's environment (e.g. natrix
+            # was installed with pipx), fall back to the executable.
+            engine = "subprocess"
+
+    fingerprint = {
+        "engine": engine,
+        "python": _executable_fingerprint("python"),
+        "vyper": _executable_fingerprint("vyper") if engine == "subprocess" else None,
+        # Shims (pyenv, asdf) select the interpreter based on these
+        "PATH": os.environ.get("PATH", ""),
+        "cwd": str(Path.cwd()),
+    }
+    if cache is not None:
+        stored = cache.load_toolchain(fingerprint)
+        if stored is not None:
+            return (
+                engine,
+                version or stored["compiler_version"],
+                [Path(p) for p in stored["sys_path"]],
+            )
+
+    if version is None:
+        version = _check_vyper_version()
+    sys_path = _obtain_sys_path()
+
+    if cache is not None:
+        cache.store_toolchain(
+            fingerprint,
+            {"compiler_version": version, "sys_path": [str(p) for p in sys_path]},
+        )
+
+    return engine, version, sys_path
+
+
+def get_toolchain(
+    engine: str = "subprocess",
+    extra_paths: tuple[Path, ...] = (),
+    cache: CompileCache | None = None,
+) -> Toolchain:
+    """
+    Return the toolchain used to compile files with the given settings.
+
+    The environment is probed only once per process: every compilation
+    sharing the same engine, extra paths, working directory and `PATH` reuses
+    it.
+    """
+    if engine not in COMPILER_ENGINES:
+        raise ValueError(
+            f"Unknown compiler engine '{engine}', "
+            f"expected one of: {', '.join(COMPILER_ENGINES)}"
+        )
+
+    key = (
+        engine,
+        extra_paths,
+        Path.cwd(),
+        # Selects the vyper and python executables
+        os.environ.get("PATH", ""),
+        cache.cache_dir if cache else None,
+    )
+    # Hold the lock while probing so that concurrent compilations wait for
+    # the first probe instead of spawning their own.
+    with _toolchain_lock:
+        if key not in _toolchains:
+            resolved_engine, version, sys_path = _probe_toolchain(engine, cache)
+
+            # Combine all paths
+            all_paths = sys_path + _obtain_default_paths() + list(extra_paths)
+
+            # Filter out non-existent paths as the vyper compiler
+            # will throw an error
+            valid_paths = tuple(p for p in all_paths if p.exists())
+
+            _toolchains[key] = Toolchain(
+                engine=resolved_engine,
+                compiler_version=version,
+                search_paths=valid_paths,
+                # Convert to compiler flags (vyper expects strings)
+                path_flags=tuple(item for p in valid_paths for item in ["-p", str(p)]),
+            )
+        return _toolchains[key]
+
+
+def vyper_compile(
+    filename: Path,
+    formatting: str,
+    extra_paths: tuple[Path, ...] = (),
+    cache: CompileCache | None = None,
+    engine: str = "subprocess",
+) -> dict[str, Any] | list[dict[str, Any]]:
+    outputs = vyper_compile_formats(
+        filename, (formatting,), extra_paths=extra_paths, cache=cache, engine=engine
+    )
+    result = outputs[formatting]
+    # Assert that result is either dict or list to satisfy mypy
+    assert isinstance(result, dict | list)
+    return result
+
+
+def vyper_compile_formats(
+    filename: Path,
+    formats: tuple[str, ...],
+    extra_paths: tuple[Path, ...] = (),
+    cache: CompileCache | None = None,
+    engine: str = "subprocess",
+    cancel: threading.Event | None = None,
+    source_code: str | None = None,
+) -> dict[str, Any]:
+    """
+    Compile a file to several output formats in a single compiler invocation.
+
+    Every format is cached separately, so that a later request for any
+    subset of them (e.g. the ABI for `codegen exports` after linting) is
+    served from the cache. Only the formats missing from the cache are
+    compiled. Setting `cancel` aborts the compilation, which then raises
+    `CompilationCancelledError`.
+
+    If `source_code` is given, it is compiled in place of the contents of
+    the file (e.g. the unsaved contents of an editor), bypassing the cache.
+
+    Returns:
+        A mapping from each requested format to the compiler output
+    """
+    toolchain = get_toolchain(engine, extra_paths, cache)
+    if source_code is not None:
+        return _compile_unsaved(filename, formats, toolchain, source_code, cancel)
+
+    outputs: dict[str, Any] = {}
+    cache_keys: dict[str, str] = {}
+    if cache is not None:
+        for formatting in formats:
+            cache_key = cache.make_key(
+                filename,
+                formatting,
+                toolchain.compiler_version,
+                list(toolchain.search_paths),
+            )
+            if cache_key is None:
+                continue
+            cache_keys[formatting] = cache_key
+            cached_output = cache.get(cache_key)
+            if cached_output is not None:
+                outputs[formatting] = cached_output
+
+    missing = [f for f in formats if f not in outputs]
+    if not missing:
+        return outputs
+
+    # Only the annotated AST lists the resolved imports, which are needed to
+    # validate cache entries later. Compile it along with the other formats
+    # unless the imports are already known from a previous compilation.
+    dependencies = None
+    if cache is not None and "annotated_ast" not in missing:
+        ast_key = cache.make_key(
+            filename,
+            "annotated_ast",
+            toolchain.compiler_version,
+            list(toolchain.search_paths),
+        )
+        if ast_key is not None:
+            cache_keys["annotated_ast"] = ast_key
+            dependencies = cache.get_dependencies(ast_key)
+    to_compile = list(missing)
+    if cache is not None and dependencies is None and "annotated_ast" not in missing:
+        to_compile.insert(0, "annotated_ast")
+
+    if toolchain.engine == "inprocess":
+        compiled = _compile_inprocess(
+            filename, to_compile, toolchain.search_paths, cancel
+        )
+    else:
+        compiled = _compile_subprocess(
+            filename, to_compile, toolchain.path_flags, cancel
+        )
+
+    if cache is not None:
+        if dependencies is None:
+            dependencies = [
+                Path(i["resolved_path"])
+                for i in compiled["annotated_ast"].get("imports", [])
+            ]
+        for formatting, result in compiled.items():
+            if formatting in cache_keys:
+                cache.put(cache_keys[formatting], result, dependencies)
+
+    outputs.update(compiled)
+    return {formatting: outputs[formatting] for formatting in formats}
+
+
+def _compile_unsaved(
+    filename: Path,
+    formats: tuple[str, ...],
+    toolchain: Toolchain,
+    source_code: str,
+    cancel: threading.Event | None,
+) -> dict[str, Any]:
+    """
+    Compile `source_code` as the contents of `filename`, without writing it
+    into the project where `natrix lint` or a watcher would pick it up.
+    """
+    if (
+        toolchain.engine == "inprocess"
+        or _inprocess_vyper_version() == toolchain.compiler_version
+    ):
+        # The in-process compiler reads the source from memory
+        return _compile_inprocess(
+            filename, list(formats), toolchain.search_paths, cancel, source_code
+        )
+
+    # The vyper executable only compiles files from disk. Compile a copy
+    # outside of the project, with the directory of the file as a search
+    # path so that its imports resolve (except relative ones).
+    with tempfile.TemporaryDirectory(prefix="natrix-") as directory:
+        copy_path = Path(directory) / filename.name
+        copy_path.write_text(source_code, encoding="utf-8")
+        path_flags = (*toolchain.path_flags, "-p", str(Path(filename).parent))
+        try:
+            compiled = _compile_subprocess(copy_path, list(formats), path_flags, cancel)
+        except CompilationCancelledError:
+            raise
+        except Exception as e:
+            raise Exception(str(e).replace(str(copy_path), str(filename))) from e
+
+    # Refer to the file rather than its copy
+    result = compiled.get("annotated_ast", {})
+    module = result.get("ast", {})
+    for container, key in (
+        (result, "contract_name"),
+        (module, "path"),
+        (module, "resolved_path"),
+    ):
+        if isinstance(container.get(key), str):
+            container[key] = container[key].replace(str(copy_path), str(filename))
+    return compiled
+
+
+# Pseudo-format under which a deferred initialization failure is cached, so
+# that warm runs don't retry a metadata compilation known to fail
+_DEFERRED_INITIALIZATION_FORMAT = "deferred_initialization_error"
+
+
+def _make_cache_key(
+    cache: CompileCache,
+    filename: Path,
+    formatting: str,
+    extra_paths: tuple[Path, ...],
+    engine: str,
+) -> str | None:
+    toolchain = get_toolchain(engine, extra_paths, cache)
+    return cache.make_key(
+        filename, formatting, toolchain.compiler_version, list(toolchain.search_paths)
+    )
+
+
+def _is_deferred_initialization_error(error: Exception) -> bool:
+    """
+    Check if compiling failed because the module uses deferred initialization
+    (`uses: module_name`), which prevents the compiler from generating
+    anything past the annotated AST.
+    """
+    error_str = str(error)
+    return (
+        "vyper.exceptions.InitializerException" in error_str
+        and "is used but never initialized!" in error_str
+    )
+
+
+def parse_file(
+    file_path: Path,
+    extra_paths: tuple[Path, ...] = (),
+    cache: CompileCache | None = None,
+    engine: str = "subprocess",
+    outputs: Collection[str] = PARSE_OUTPUTS,
+    source_code: str | None = None,
+    cancel: threading.Event | None = None,
+) -> dict[str, Any]:
+    """
+    Compile a file and collect the requested parts of the module
+    (see `PARSE_OUTPUTS`). All compiler formats are produced in a single
+    compiler invocation.
+
+    If `source_code` is given, it is compiled in place of the contents of
+    the file (e.g. the unsaved contents of an editor), bypassing the cache.
+    Setting `cancel` aborts the compilation, see `vyper_compile_formats`.
+    """
+    if source_code is not None:
+        # Cache entries are keyed by the contents of the file on disk
+        cache = None
+
+    formats: list[str] = []
+    if "ast" in outputs:
+        formats.append("annotated_ast")
+    # For interface files (.vyi), we only compile to AST, not metadata
+    if "metadata" in outputs and file_path.suffix != ".vyi":
+        # Once metadata has been generated the ABI comes almost for free,
+        # compile it in the same pass so that codegen on this module is
+        # served from the cache.
+        formats.extend(["metadata", "abi"])
+
+    deferred_key = None
+    if cache is not None and "metadata" in formats:
+        deferred_key = _make_cache_key(
+            cache, file_path, _DEFERRED_INITIALIZATION_FORMAT, extra_paths, engine
+        )
+        if deferred_key is not None and cache.contains(deferred_key):
+            # The metadata is known not to compile, see below
+            formats = [f for f in formats if f not in ("metadata", "abi")]
+
+    compiled: dict[str, Any] = {}
+    if formats:
+        try:
+            compiled = vyper_compile_formats(
+                file_path,
+                tuple(formats),
+                extra_paths=extra_paths,
+                cache=cache,
+                engine=engine,
+                cancel=cancel,
+                source_code=source_code,
+            )
+        except Exception as e:
+            if "metadata" not in formats or not _is_deferred_initialization_error(e):
+                raise e
             # Skip metadata for files with deferred module initialization
             # This is a known limitation of the Vyper compiler
-            pass
-        else:
-            # Re-raise other exceptions
-            raise e
-
-    return ast
+            if "annotated_ast" in formats:
+                compiled = vyper_compile_formats(
+                    file_path,
+                    ("annotated_ast",),
+                    extra_paths=extra_paths,
+                    cache=cache,
+                    engine=engine,
+                    cancel=cancel,
+                    source_code=source_code,
+                )
+            if cache is not None and deferred_key is not None:
+                # Remember the failure until the module or its imports change
+                ast_key = _make_cache_key(
+                    cache, file_path, "annotated_ast", extra_paths, engine
+                )
+                dependencies = cache.get_dependencies(ast_key) if ast_key else None
+                if dependencies is not None:
+                    cache.put(deferred_key, True, dependencies)
+
+    # For annotated_ast, the compiler returns a dict
+    result: dict[str, Any] = compiled.get("annotated_ast", {})
+    assert isinstance(result, dict)
+
+    if "comments" in outputs:
+        result["comments"] = _parse_comments(file_path, source_code)
+
+    if "metadata" in compiled:
+        result["metadata"] = compiled["metadata"]
+    if "abi" in compiled:
+        result["abi"] = compiled["abi"]
+
+    return result
 
 
 def parse_source(source_code: str) -> dict[str, Any]:
@@ -175,8 +674,6 @@ def parse_source(source_code: str) -> dict[str, Any]:
     Returns:
         The parsed AST with metadata
     """
-    import tempfile
-
     # Create a temporary file to hold the source code
     with tempfile.NamedTemporaryFile(mode="w", suffix=".vy", delete=False) as temp_file:
         temp_file.write(source_code)
@@ -191,15 +688,92 @@ def parse_source(source_code: str) -> dict[str, Any]:
         Path(temp_file_path).unlink()
 
 
+# Dispatch tables of the visitor classes, see `_visitor_methods`
+_visitor_methods_cache: dict[type, dict[str, str]] = {}
+
+
+def _visitor_methods(visitor_class: type) -> dict[str, str]:
+    """
+    Map each AST node type to the name of the `visit_*` method handling it
+    in `visitor_class`. Built once per visitor class.
+    """
+    methods = _visitor_methods_cache.get(visitor_class)
+    if methods is None:
+        methods = {
+            name[len("visit_") :]: name
+            for name in dir(visitor_class)
+            if name.startswith("visit_") and callable(getattr(visitor_class, name))
+        }
+        _visitor_methods_cache[visitor_class] = methods
+    return methods
+
+
 class VyperASTVisitor:
     def visit(self, node: Node) -> None:
-        ast_type = node.ast_type
-        if ast_type:
-            method_name = f"visit_{ast_type}"
-            visitor = getattr(self, method_name, None)
-            if visitor:
-                visitor(node)
-
-        if node.children:
-            for child in node.children:
-                self.visit(child)
+        MultiVisitor([self]).visit(node)
+
+
+class MultiVisitor:
+    """
+    Walk an AST once, dispatching every node to the `visit_*` methods of
+    several visitors.
+
+    Each visitor sees the nodes in the same order as if it walked the tree
+    on its own. If `on_error` is given, a visitor raising an exception is
+    reported through it and receives no further nodes, the other visitors
+    keep going. Otherwise the exception propagates.
+    """
+
+    def __init__(
+        self,
+        visitors: Sequence[VyperASTVisitor],
+        on_error: Callable[[VyperASTVisitor, Exception], None] | None = None,
+    ):
+        self.visitors = list(visitors)
+        self.on_error = on_error
+        self._build_dispatch_table()
+
+    def _build_dispatch_table(self) -> None:
+        # ast_type -> [(visitor, bound handler)], in visitor order
+        self._dispatch: dict[str, list[tuple[VyperASTVisitor, Callable]]] = {}
+        for visitor in self.visitors:
+            for ast_type, name in _visitor_methods(type(visitor)).items():
+                handlers = self._dispatch.setdefault(ast_type, [])
+                handlers.append((visitor, getattr(visitor, name)))
+
+    def remove(self, visitor: VyperASTVisitor) -> None:
+        """Stop dispatching nodes to `visitor`."""
+        self.visitors.remove(visitor)
+        self._build_dispatch_table()
+
+    def visit(self, node: Node) -> None:
+        index = node.index
+        if index is not None:
+            # Only reach the nodes of the handled types, in preorder. The
+            # type index skips every subtree holding none of them, without
+            # wrapping its nodes
+            handled = tuple(self._dispatch)
+            for position in index.iter_positions(handled, node.enter, node.exit):
+                self._dispatch_node(index.node_at(position))
+            return
+
+        # Iterative pre-order traversal, children are pushed in reverse
+        # so that they are visited in their original order
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self._dispatch_node(current)
+            if current.children:
+                stack.extend(reversed(current.children))
+
+    def _dispatch_node(self, node: Node) -> None:
+        handlers = self._dispatch.get(node.ast_type or "")
+        if handlers:
+            for visitor, handler in handlers:
+                try:
+                    handler(node)
+                except Exception as e:
+                    if self.on_error is None:
+                        raise
+                    self.on_error(visitor, e)
+                    self.remove(visitor)
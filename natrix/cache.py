@@ -0,0 +1,186 @@
+"""On-disk cache for Vyper compiler outputs."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any
+
+from natrix import interning
+
+# Bump this whenever the layout of cache entries changes.
+CACHE_FORMAT_VERSION = 1
+
+
+def default_cache_dir() -> Path:
+    """
+    Return the default cache directory, following the XDG base directory spec.
+    """
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg_cache_home) if xdg_cache_home else Path.home() / ".cache"
+    return base / "natrix"
+
+
+def file_digest(path: Path) -> str | None:
+    """Return the sha256 digest of a file's content, or None if unreadable."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+class CompileCache:
+    """
+    Content-addressed cache for compiler outputs.
+
+    Entries are keyed by the compiled file, its content hash, the compiler
+    version, the output format and the search paths. Each entry also records
+    the hashes of every module the file imports at the time of compilation;
+    an entry is only considered a hit if all of them are still unchanged.
+    """
+
+    def __init__(self, cache_dir: Path | None = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+        # Guards the counters, the cache may be shared by compilation threads
+        self._lock = threading.Lock()
+
+    def make_key(
+        self,
+        filename: Path,
+        formatting: str,
+        compiler_version: str,
+        search_paths: list[Path],
+    ) -> str | None:
+        """
+        Compute the cache key for a compilation request.
+
+        Returns None if the source file cannot be read, in which case
+        the request should not be cached.
+        """
+        source_digest = file_digest(Path(filename))
+        if source_digest is None:
+            return None
+
+        # The compiler output embeds the file path as it was given
+        # (relative paths included), so the working directory is part
+        # of the key as well.
+        key_material = {
+            "cache_format": CACHE_FORMAT_VERSION,
+            "filename": str(filename),
+            "cwd": str(Path.cwd()),
+            "source": source_digest,
+            "compiler_version": compiler_version,
+            "format": formatting,
+            "search_paths": [str(p.resolve()) for p in search_paths],
+        }
+        encoded = json.dumps(key_material, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / "compile" / key[:2] / f"{key}.json"
+
+    def _load_entry(self, key: str) -> dict[str, Any] | None:
+        """Load an entry if it exists and none of its imports changed."""
+        try:
+            with self._entry_path(key).open("r", encoding="utf-8") as f:
+                entry = interning.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(entry, dict):
+            return None
+
+        for dep_path, dep_digest in entry.get("dependencies", {}).items():
+            if file_digest(Path(dep_path)) != dep_digest:
+                return None
+
+        return entry
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached output for `key`, updating hit/miss counters."""
+        entry = self._load_entry(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry["output"]
+
+    def contains(self, key: str) -> bool:
+        """
+        Check if `key` has a valid entry without counting the lookup as a hit
+        or a miss.
+        """
+        return self._load_entry(key) is not None
+
+    def get_dependencies(self, key: str) -> list[Path] | None:
+        """
+        Return the dependencies recorded for `key` without counting
+        the lookup as a hit or a miss.
+        """
+        entry = self._load_entry(key)
+        if entry is None:
+            return None
+        return [Path(p) for p in entry.get("dependencies", {})]
+
+    def put(self, key: str, output: Any, dependencies: list[Path]) -> None:
+        """Store `output` under `key` along with the hashes of its imports."""
+        dependency_digests = {}
+        for dep_path in dependencies:
+            digest = file_digest(dep_path)
+            if digest is None:
+                # Can't validate this entry later, don't cache it.
+                return
+            dependency_digests[str(dep_path)] = digest
+
+        entry = {"dependencies": dependency_digests, "output": output}
+        self._write_json(self._entry_path(key), entry)
+
+    def _write_json(self, path: Path, data: Any) -> None:
+        tmp_path: Path | None = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so that concurrent readers
+            # never observe a partially written entry.
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            tmp_path = Path(tmp_name)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            tmp_path.replace(path)
+        except OSError:
+            # Caching is best effort, a read-only cache dir shouldn't
+            # prevent linting.
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    tmp_path.unlink()
+
+    def _toolchain_path(self, fingerprint: dict[str, Any]) -> Path:
+        encoded = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(encoded).hexdigest()
+        return self.cache_dir / "toolchain" / f"{digest}.json"
+
+    def load_toolchain(self, fingerprint: dict[str, Any]) -> dict[str, Any] | None:
+        """Return the toolchain information stored for `fingerprint`, if any."""
+        try:
+            with self._toolchain_path(fingerprint).open("r", encoding="utf-8") as f:
+                toolchain = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return toolchain if isinstance(toolchain, dict) else None
+
+    def store_toolchain(
+        self, fingerprint: dict[str, Any], toolchain: dict[str, Any]
+    ) -> None:
+        """Persist toolchain information so later runs can skip probing."""
+        self._write_json(self._toolchain_path(fingerprint), toolchain)
+
+    def summary(self) -> str:
+        """Return a line with the numbers of cache hits and misses so far."""
+        return f"Compiler cache: {self.hits} hits, {self.misses} misses."
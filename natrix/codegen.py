@@ -1,17 +1,31 @@
 """Code generation functionality for Natrix."""
 
-from pathlib import Path
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 
 from natrix.ast_node import ModuleNode, Node
 from natrix.ast_tools import vyper_compile
 
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from natrix.cache import CompileCache
+
 
-def generate_exports(file_path: Path, extra_paths: tuple[Path, ...]) -> str:
+def generate_exports(
+    file_path: Path,
+    extra_paths: tuple[Path, ...],
+    cache: CompileCache | None = None,
+    engine: str = "subprocess",
+) -> str:
     """Generate explicit exports for a Vyper contract.
 
     Args:
         file_path: Path to the Vyper contract file
         extra_paths: Additional paths to search for imports
+        cache: Cache for compiler outputs, shared with the linter
+        engine: Compiler engine to use
 
     Returns:
         A string containing the exports declaration
@@ -19,8 +33,11 @@ def generate_exports(file_path: Path, extra_paths: tuple[Path, ...]) -> str:
     # Extract module name from file path
     module_name = file_path.stem
 
-    # Get the ABI from vyper
-    abi = vyper_compile(file_path, "abi", extra_paths=extra_paths)
+    # Get the ABI from vyper. The path is resolved like the linter does, so that
+    # both share the same cached compiler outputs.
+    abi = vyper_compile(
+        file_path.resolve(), "abi", extra_paths=extra_paths, cache=cache, engine=engine
+    )
     # For abi format, vyper_compile returns a list
     assert isinstance(abi, list)
 
@@ -46,7 +63,11 @@ def generate_exports(file_path: Path, extra_paths: tuple[Path, ...]) -> str:
 
 
 def generate_call_graph(
-    file_path: Path, extra_paths: tuple[Path, ...], target_function: str | None = None
+    file_path: Path,
+    extra_paths: tuple[Path, ...],
+    target_function: str | None = None,
+    cache: CompileCache | None = None,
+    engine: str = "subprocess",
 ) -> str:
     """Generate a Mermaid call graph for a Vyper contract.
 
@@ -54,12 +75,20 @@ def generate_call_graph(
         file_path: Path to the Vyper contract file
         extra_paths: Additional paths to search for imports
         target_function: Optional specific function to generate call graph for
+        cache: Cache for compiler outputs, shared with the linter
+        engine: Compiler engine to use
 
     Returns:
         A string containing the Mermaid diagram
     """
     # Get the annotated AST from vyper
-    full_dict = vyper_compile(file_path, "annotated_ast", extra_paths=extra_paths)
+    full_dict = vyper_compile(
+        file_path.resolve(),
+        "annotated_ast",
+        extra_paths=extra_paths,
+        cache=cache,
+        engine=engine,
+    )
     assert isinstance(full_dict, dict)
     ast_dict = full_dict.get("ast", full_dict)  # Extract the 'ast' key if present
 
@@ -0,0 +1,209 @@
+"""
+Columnar (struct-of-arrays) representation of a module's AST.
+
+The `Node` API is convenient for rules looking at a few nodes at a time.
+Analyses covering every node of a project are faster as vectorized
+operations over flat arrays, which this module provides. It requires NumPy,
+install it with `pip install natrix[columnar]`.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+# NumPy is an optional dependency, only needed for the columnar AST
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+    from natrix.ast_node import Node, NodeIndex
+
+# Value used in the integer columns when a node has no such field
+MISSING = -1
+
+# Node fields holding identifiers, interned in `ColumnarAST.identifiers`
+_IDENTIFIER_FIELDS = ("id", "name", "attr")
+
+
+class ColumnarAST:
+    """
+    Flat, array-backed view of an indexed AST.
+
+    Row `i` of every node column describes the node at preorder position `i`
+    of the tree (`index.nodes[i]`):
+
+    - `type_code`: the node type, see `type_names`
+    - `parent`: the position of the parent node
+    - `exit`: the position right after the last descendant, the node's
+      subtree spans `[i, exit[i])`
+    - `function`: the position of the enclosing `FunctionDef` (the function
+      itself for a `FunctionDef`)
+    - `lineno`, `col_offset`, `end_lineno`, `end_col_offset`: the source span
+    - `identifier`: the `id`, `name` or `attr` of the node, see `identifiers`
+
+    Variable accesses (the `variable_reads` and `variable_writes` the
+    compiler attaches to nodes) are stored in a separate table, one row per
+    access: `access_node`, `access_variable` (an identifier) and
+    `access_is_write`.
+
+    Missing values are `MISSING`.
+    """
+
+    def __init__(self, index: NodeIndex):
+        if np is None:
+            raise ImportError(
+                "The columnar AST requires NumPy, "
+                "install it with `pip install natrix[columnar]`."
+            )
+
+        self.index = index
+        size = len(index.dicts)
+
+        # Interning tables
+        self.type_names: list[str] = []
+        self._type_codes: dict[str, int] = {}
+        self.identifiers: list[str] = []
+        self._identifier_ids: dict[str, int] = {}
+
+        type_code = np.full(size, MISSING, dtype=np.int32)
+        parent = np.asarray(index.parents, dtype=np.int32)
+        exit_ = np.asarray(index.exits, dtype=np.int32)
+        function = np.full(size, MISSING, dtype=np.int32)
+        identifier = np.full(size, MISSING, dtype=np.int32)
+        spans = np.full((4, size), MISSING, dtype=np.int32)
+
+        access_node: list[int] = []
+        access_variable: list[int] = []
+        access_is_write: list[bool] = []
+
+        # Read the node dicts, the nodes don't need to be wrapped
+        for position, node_dict in enumerate(index.dicts):
+            ast_type = node_dict.get("ast_type")
+            if isinstance(ast_type, str):
+                type_code[position] = self._intern_type(ast_type)
+
+            for row, field in enumerate(
+                ("lineno", "col_offset", "end_lineno", "end_col_offset")
+            ):
+                value = node_dict.get(field)
+                if isinstance(value, int):
+                    spans[row, position] = value
+
+            for field in _IDENTIFIER_FIELDS:
+                value = node_dict.get(field)
+                if isinstance(value, str):
+                    identifier[position] = self.intern(value)
+                    break
+
+            for field, is_write in (
+                ("variable_reads", False),
+                ("variable_writes", True),
+            ):
+                for access in node_dict.get(field) or ():
+                    name = access.get("name")
+                    if isinstance(name, str):
+                        access_node.append(position)
+                        access_variable.append(self.intern(name))
+                        access_is_write.append(is_write)
+
+        # Functions can't be nested, each one owns its whole subtree
+        for position in np.flatnonzero(type_code == self.code_of("FunctionDef")):
+            function[position : exit_[position]] = position
+
+        self.type_code = type_code
+        self.parent = parent
+        self.exit = exit_
+        self.function = function
+        self.identifier = identifier
+        self.lineno, self.col_offset, self.end_lineno, self.end_col_offset = spans
+
+        self.access_node = np.asarray(access_node, dtype=np.int32)
+        self.access_variable = np.asarray(access_variable, dtype=np.int32)
+        self.access_is_write = np.asarray(access_is_write, dtype=np.bool_)
+
+    def __len__(self) -> int:
+        return len(self.index.dicts)
+
+    def _intern_type(self, ast_type: str) -> int:
+        code = self._type_codes.get(ast_type)
+        if code is None:
+            code = len(self.type_names)
+            self._type_codes[ast_type] = code
+            self.type_names.append(ast_type)
+        return code
+
+    def intern(self, identifier: str) -> int:
+        """Return the id of `identifier`, adding it to `identifiers` if needed."""
+        identifier_id = self._identifier_ids.get(identifier)
+        if identifier_id is None:
+            identifier_id = len(self.identifiers)
+            self._identifier_ids[identifier] = identifier_id
+            self.identifiers.append(identifier)
+        return identifier_id
+
+    def code_of(self, ast_type: str) -> int:
+        """Return the code of `ast_type`, or `MISSING` if no node has it."""
+        return self._type_codes.get(ast_type, MISSING)
+
+    def positions_of(self, *ast_types: str) -> NDArray[Any]:
+        """Return the positions of the nodes of the given types, in preorder."""
+        codes = [self.code_of(ast_type) for ast_type in ast_types]
+        return np.flatnonzero(np.isin(self.type_code, codes))
+
+    def node(self, position: int) -> Node:
+        """Return the `Node` at `position`."""
+        return self.index.node_at(position)
+
+    def names_by_function(self) -> dict[int, set[str]]:
+        """
+        Return the identifiers of the `Name` nodes in every function, keyed by
+        the position of the function (interfaces can define functions sharing
+        a name with the module's own).
+        """
+        positions = np.flatnonzero(
+            (self.type_code == self.code_of("Name")) & (self.function != MISSING)
+        )
+        pairs = np.unique(
+            np.stack([self.function[positions], self.identifier[positions]]), axis=1
+        )
+
+        names: dict[int, set[str]] = {}
+        for function, identifier in pairs.T.tolist():
+            if identifier != MISSING:
+                names.setdefault(function, set()).add(self.identifiers[identifier])
+        return names
+
+    def accesses_by_function(self) -> dict[int, dict[str, tuple[int, int]]]:
+        """
+        Return, for every function, the number of reads and writes of each
+        variable it accesses, keyed by the position of the function.
+        """
+        functions = self.function[self.access_node]
+        in_function = functions != MISSING
+        keys = np.stack(
+            [
+                functions[in_function],
+                self.access_variable[in_function],
+                self.access_is_write[in_function],
+            ]
+        )
+        if keys.shape[1] == 0:
+            return {}
+        unique_keys, counts = np.unique(keys, axis=1, return_counts=True)
+
+        accesses: dict[int, dict[str, tuple[int, int]]] = {}
+        for (function, variable, is_write), count in zip(
+            unique_keys.T.tolist(), counts.tolist(), strict=True
+        ):
+            per_variable = accesses.setdefault(function, {})
+            reads, writes = per_variable.get(self.identifiers[variable], (0, 0))
+            if is_write:
+                writes += count
+            else:
+                reads += count
+            per_variable[self.identifiers[variable]] = (reads, writes)
+        return accesses
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from natrix.ast_node import Node
-from natrix.ast_tools import parse_file
+from natrix.ast_tools import PARSE_OUTPUTS, parse_file
+
+if TYPE_CHECKING:
+    import threading
+    from collections.abc import Collection
+
+    from natrix.cache import CompileCache
+    from natrix.columnar import ColumnarAST
 
 
 @dataclass
@@ -19,15 +28,58 @@ class ModuleInfo:
     compiler_output: dict[str, Any] = field(
         default_factory=dict
     )  # Full compiler output
+    outputs: set[str] = field(
+        default_factory=set
+    )  # Parts of the module compiled so far (see PARSE_OUTPUTS)
+
+    @cached_property
+    def compiler_output_node(self) -> Node:
+        """
+        Node view of the compiler output, shared by every rule linting this
+        module.
+
+        It is only built the first time it is needed. Lookups read through
+        to `compiler_output`, so the parts compiled later by
+        `ensure_outputs` are visible as well.
+        """
+        return Node(self.compiler_output, lazy=True)
+
+    @cached_property
+    def columnar_ast(self) -> ColumnarAST:
+        """
+        Array-backed view of the AST, for vectorized analyses. Requires NumPy.
+        """
+        # Imported here so that linting doesn't pay for importing NumPy
+        from natrix.columnar import ColumnarAST
+
+        assert self.ast_node.index is not None
+        return ColumnarAST(self.ast_node.index)
 
 
 class ProjectContext:
     """Manages the entire project's dependency graph and module compilation."""
 
-    def __init__(self, initial_files: list[Path], extra_paths: tuple[Path, ...] = ()):
+    def __init__(
+        self,
+        initial_files: list[Path],
+        extra_paths: tuple[Path, ...] = (),
+        cache: CompileCache | None = None,
+        jobs: int = 1,
+        engine: str = "subprocess",
+        outputs: Collection[str] = PARSE_OUTPUTS,
+    ):
         # Normalize initial files to absolute Path objects
         self.initial_files = [f.resolve() for f in initial_files]
+        self._initial_file_set = set(self.initial_files)
+        # Parts of the module compiled upfront for the initial files. Modules
+        # only reached through imports are compiled to the AST alone, which is
+        # enough to resolve the dependency graph. Anything else is compiled
+        # on demand through `ensure_outputs`.
+        self.outputs = frozenset(outputs) | {"ast"}
         self.extra_paths = extra_paths
+        self.cache = cache
+        self.jobs = jobs
+        self.engine = engine
         self.modules: dict[Path, ModuleInfo] = {}
         self.project_root = self._determine_project_root()
         self._build_graph()
@@ -51,9 +103,35 @@ class ProjectContext:
 
     def _build_graph(self) -> None:
         """Build the dependency graph for all modules."""
+        compiled = self._compile_all(
+            self.initial_files, known=set(), initial_files=self._initial_file_set
+        )
+        for file_path, compiler_output in compiled.items():
+            self._add_module(file_path, compiler_output)
+
+        self._link_dependents()
+
+    def _compile_all(
+        self, roots: Collection[Path], known: set[Path], initial_files: set[Path]
+    ) -> dict[Path, dict[str, Any]]:
+        """
+        Compile `roots` and, recursively, the modules they import which
+        aren't `known` already. Nothing is registered, so that a failed
+        compilation leaves the project untouched.
+        """
+        if self.jobs > 1:
+            return self._compile_concurrently(roots, known, initial_files)
+        return self._compile_serially(roots, known, initial_files)
+
+    def _compile_serially(
+        self, roots: Collection[Path], known: set[Path], initial_files: set[Path]
+    ) -> dict[Path, dict[str, Any]]:
+        """Compile modules one at a time, following imports as they are found."""
+        compiled: dict[Path, dict[str, Any]] = {}
+
         # Queue of files to process
-        to_process: set[Path] = set(self.initial_files)
-        processed: set[Path] = set()
+        to_process: set[Path] = set(roots)
+        processed: set[Path] = set(known)
 
         while to_process:
             file_path = to_process.pop()
@@ -64,43 +142,234 @@ class ProjectContext:
 
             processed.add(file_path)
 
-            # Compile the file
-            compiler_output = parse_file(file_path, extra_paths=self.extra_paths)
-
-            # Create ModuleInfo
-            module_info = ModuleInfo(
-                path=file_path,
-                ast_node=Node.from_dict(compiler_output["ast"]),
-                compiler_output=compiler_output,
+            compiler_output = self._compile(
+                file_path, self._initial_outputs(file_path, initial_files)
             )
+            compiled[file_path] = compiler_output
 
-            # Store the module
-            self.modules[file_path] = module_info
+            # Queue imports that haven't been compiled yet
+            to_process.update(_imported_paths(compiler_output) - processed)
 
-            # Process imports
-            for import_info in compiler_output.get("imports", []):
-                dep_path = Path(import_info["resolved_path"]).resolve()
+        return compiled
 
-                # Add to dependencies
-                module_info.dependencies.add(dep_path)
+    def _compile_concurrently(
+        self, roots: Collection[Path], known: set[Path], initial_files: set[Path]
+    ) -> dict[Path, dict[str, Any]]:
+        """
+        Compile the frontier of discovered modules on a pool of `jobs` workers.
 
-                # Add this file as a dependent of the imported module
-                if dep_path in self.modules:
-                    self.modules[dep_path].dependents.add(file_path)
-                else:
-                    # Add to processing queue
-                    to_process.add(dep_path)
+        Compilation is dominated by compiler subprocesses, so threads are
+        enough to keep all cores busy. Imports found in each compiled module
+        are fed back into the pool as soon as the module completes.
+        """
+        compiled: dict[Path, dict[str, Any]] = {}
+        executor = ThreadPoolExecutor(max_workers=self.jobs)
+        pending: dict[Future[dict[str, Any]], Path] = {}
+        scheduled: set[Path] = set(known)
+
+        def schedule(file_path: Path) -> None:
+            if file_path not in scheduled:
+                scheduled.add(file_path)
+                outputs = self._initial_outputs(file_path, initial_files)
+                pending[executor.submit(self._compile, file_path, outputs)] = file_path
+
+        try:
+            for file_path in roots:
+                schedule(file_path)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    compiled[file_path] = future.result()
+                    for dep_path in _imported_paths(compiled[file_path]):
+                        schedule(dep_path)
+        finally:
+            # Don't wait for queued compilations if one of them failed
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return compiled
+
+    def _initial_outputs(
+        self, file_path: Path, initial_files: set[Path] | None = None
+    ) -> frozenset[str]:
+        """Parts of the module to compile while building the graph."""
+        if initial_files is None:
+            initial_files = self._initial_file_set
+        if file_path in initial_files:
+            return self.outputs
+        return frozenset({"ast"})
+
+    def _compile(self, file_path: Path, outputs: Collection[str]) -> dict[str, Any]:
+        return parse_file(
+            file_path,
+            extra_paths=self.extra_paths,
+            cache=self.cache,
+            engine=self.engine,
+            outputs=outputs,
+        )
+
+    def _add_module(
+        self, file_path: Path, compiler_output: dict[str, Any]
+    ) -> ModuleInfo:
+        """Register a compiled module and record the modules it imports."""
+        module_info = ModuleInfo(
+            path=file_path,
+            # Nodes are wrapped on first access, modules that are only
+            # imported are mostly never traversed
+            ast_node=Node.from_dict(compiler_output["ast"], lazy=True),
+            dependencies=_imported_paths(compiler_output),
+            compiler_output=compiler_output,
+            outputs=set(self._initial_outputs(file_path)),
+        )
+        self.modules[file_path] = module_info
+        return module_info
 
-        # Second pass: Update dependents for all modules
+    def _link_dependents(self) -> None:
+        """Record each module as a dependent of the modules it imports."""
+        for module_info in self.modules.values():
+            module_info.dependents.clear()
         for module_path, module_info in self.modules.items():
             for dep_path in module_info.dependencies:
                 if dep_path in self.modules:
                     self.modules[dep_path].dependents.add(module_path)
 
+    def update(self, changed_paths: Collection[Path]) -> list[Path]:
+        """
+        Bring the project up to date after files were modified, added or
+        deleted.
+
+        Only the changed modules and the modules importing them, directly or
+        not, are recompiled, since their compiler output may differ. Changed
+        files which aren't part of the project yet are added to the files to
+        lint, deleted files are removed from the project along with the
+        modules no longer imported by any file to lint. If a compilation
+        fails, the error is raised and the project is left untouched.
+
+        Returns:
+            The files to lint whose issues may have changed, in the order of
+            `initial_files`
+        """
+        changed = {Path(p).resolve() for p in changed_paths}
+        deleted = {p for p in changed if not p.is_file()}
+        added = {
+            p for p in changed - deleted if p not in self.modules
+        } - self._initial_file_set
+
+        # Modules whose compiler output may now differ
+        stale = {p for p in changed if p in self.modules}
+        to_visit = list(stale)
+        while to_visit:
+            for dependent in self.modules[to_visit.pop()].dependents:
+                if dependent not in stale:
+                    stale.add(dependent)
+                    to_visit.append(dependent)
+
+        initial_file_set = (self._initial_file_set | added) - deleted
+        to_compile = (stale | added) - deleted
+        compiled = self._compile_all(
+            to_compile,
+            known=(set(self.modules) - stale) | deleted,
+            initial_files=initial_file_set,
+        )
+
+        # Everything compiled, update the project
+        self.initial_files = [
+            p for p in self.initial_files if p not in deleted
+        ] + sorted(added)
+        self._initial_file_set = initial_file_set
+        for file_path in deleted:
+            self.modules.pop(file_path, None)
+        for file_path, compiler_output in compiled.items():
+            self._add_module(file_path, compiler_output)
+        self._prune_unreachable()
+        self._link_dependents()
+
+        return [p for p in self.initial_files if p in to_compile]
+
+    def update_module(
+        self,
+        file_path: Path,
+        source_code: str | None = None,
+        outputs: Collection[str] | None = None,
+        cancel: threading.Event | None = None,
+    ) -> ModuleInfo:
+        """
+        Recompile a single module, adding it to the files to lint if needed.
+
+        The module is compiled from `source_code` if given (e.g. the unsaved
+        contents of an editor), or else from the file on disk, to the given
+        `outputs` (all the ones of the project by default). Only this module
+        is recompiled, along with the modules it starts importing: the
+        modules importing it keep their output until `update` is called with
+        it. If the compilation fails or `cancel` is set (see
+        `vyper_compile_formats`), the error is raised and the project is
+        left untouched. The parts compiled later by `ensure_outputs` always
+        come from the file on disk.
+        """
+        file_path = file_path.resolve()
+        outputs = self.outputs if outputs is None else frozenset(outputs) | {"ast"}
+        initial_file_set = self._initial_file_set | {file_path}
+        compiler_output = parse_file(
+            file_path,
+            extra_paths=self.extra_paths,
+            cache=self.cache,
+            engine=self.engine,
+            outputs=outputs,
+            source_code=source_code,
+            cancel=cancel,
+        )
+        compiled = self._compile_all(
+            _imported_paths(compiler_output),
+            known=set(self.modules) | {file_path},
+            initial_files=initial_file_set,
+        )
+
+        # Everything compiled, update the project
+        if file_path not in self._initial_file_set:
+            self.initial_files.append(file_path)
+        self._initial_file_set = initial_file_set
+        for compiled_path, output in compiled.items():
+            self._add_module(compiled_path, output)
+        module_info = self._add_module(file_path, compiler_output)
+        module_info.outputs = set(outputs)
+        self._prune_unreachable()
+        self._link_dependents()
+
+        return module_info
+
+    def _prune_unreachable(self) -> None:
+        """Drop the modules no longer imported, even indirectly, by a file to lint."""
+        reachable: set[Path] = set()
+        to_visit = [p for p in self.initial_files if p in self.modules]
+        while to_visit:
+            file_path = to_visit.pop()
+            if file_path in reachable:
+                continue
+            reachable.add(file_path)
+            to_visit.extend(
+                p for p in self.modules[file_path].dependencies if p in self.modules
+            )
+
+        for file_path in set(self.modules) - reachable:
+            del self.modules[file_path]
+
     def get_module(self, path: Path) -> ModuleInfo:
         """Retrieve a module by its path."""
         return self.modules[path]
 
+    def ensure_outputs(self, path: Path, outputs: Collection[str]) -> ModuleInfo:
+        """
+        Retrieve a module, compiling any of the requested parts
+        (see `PARSE_OUTPUTS`) that haven't been compiled yet.
+        """
+        module_info = self.get_module(path)
+        missing = set(outputs) - module_info.outputs
+        if missing:
+            module_info.compiler_output.update(self._compile(path, missing))
+            module_info.outputs.update(missing)
+        return module_info
+
     def get_dependents_of(self, path: Path) -> set[Path]:
         """Get all modules that import the given module."""
         module = self.get_module(path)
@@ -118,3 +387,11 @@ class ProjectContext:
     def get_all_modules(self) -> list[ModuleInfo]:
         """Get all modules."""
         return list(self.modules.values())
+
+
+def _imported_paths(compiler_output: dict[str, Any]) -> set[Path]:
+    """Return the resolved paths of the modules imported by a compiled module."""
+    return {
+        Path(import_info["resolved_path"]).resolve()
+        for import_info in compiler_output.get("imports", [])
+    }
@@ -0,0 +1,60 @@
+"""Compact loading of compiler outputs."""
+
+from __future__ import annotations
+
+import json
+from sys import intern
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Fields holding names (node types, identifiers, type classes), the same few
+# strings are repeated by thousands of nodes
+_INTERNED_FIELDS = frozenset({"ast_type", "name", "id", "attr", "arg", "typeclass"})
+
+# Fields holding annotations which are identical for many nodes: the type of
+# an expression, or a reference to a declaration
+_SHARED_FIELDS = frozenset({"type", "decl_node", "type_decl_node"})
+
+_COMPACTED_FIELDS = _INTERNED_FIELDS | _SHARED_FIELDS
+
+
+def _compacting_hook() -> Callable[[dict[str, Any]], dict[str, Any]]:
+    """
+    Return an `object_hook` for `json.load(s)` interning the names of the
+    objects it's given, and replacing their annotations by a shared copy when
+    an identical one was already loaded.
+
+    The shared annotations are only looked up within one document, so that
+    long running processes don't keep the annotations of every module they
+    ever loaded.
+    """
+    # Canonical copy of every annotation seen so far, by content. The `repr`
+    # of a JSON value identifies it, and is cheap to build
+    shared_values: dict[str, dict[str, Any]] = {}
+
+    def compact_object(obj: dict[str, Any]) -> dict[str, Any]:
+        for field in _COMPACTED_FIELDS.intersection(obj):
+            value = obj[field]
+            if value.__class__ is str:
+                if field in _INTERNED_FIELDS:
+                    obj[field] = intern(value)
+            elif value.__class__ is dict and field in _SHARED_FIELDS:
+                obj[field] = shared_values.setdefault(repr(value), value)
+        return obj
+
+    return compact_object
+
+
+def loads(text: str) -> Any:
+    """
+    Deserialize a compiler output, sharing the repeated names and annotations
+    between its nodes. The shared annotations must be treated as read-only.
+    """
+    return json.loads(text, object_hook=_compacting_hook())
+
+
+def load(fp: IO[str]) -> Any:
+    """Deserialize a compiler output from a file, see `loads`."""
+    return json.load(fp, object_hook=_compacting_hook())
@@ -0,0 +1,559 @@
+"""
+Language Server Protocol mode.
+
+`natrix lsp` publishes the issues of the documents open in an editor as
+diagnostics, while they are edited. It talks LSP over stdio and keeps a
+`ProjectContext` of the open documents and the modules they import:
+
+- Edits are debounced, a document is relinted once it hasn't changed for
+  `debounce` seconds.
+- Only the edited module is recompiled, from the unsaved contents of the
+  editor (see `ProjectContext.update_module`). The rules needing the
+  compiler metadata, which is slow to compile, only run once the document
+  is saved. Saving a document also relints the open documents importing it.
+- An edit to a document being compiled cancels the compilation, so that a
+  result nobody will look at never delays the next one.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from natrix import (
+    VYPER_EXTENSIONS,
+    OutputFormatter,
+    lint_file,
+    read_pyproject_config,
+)
+from natrix.__version__ import __version__
+from natrix.ast_tools import CompilationCancelledError
+from natrix.context import ProjectContext
+from natrix.rules.common import Issue, Rule, RuleRegistry
+from natrix.server import INVALID_REQUEST, METHOD_NOT_FOUND, SERVER_ERROR
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from natrix.cache import CompileCache
+
+# LSP error code of requests received before `initialize`
+SERVER_NOT_INITIALIZED = -32002
+
+# LSP diagnostic severities of the natrix severities
+_DIAGNOSTIC_SEVERITIES = {"important": 1, "warning": 2, "optimization": 3, "style": 3}
+# LSP diagnostic severity of compilation errors
+_ERROR_SEVERITY = 1
+# LSP text document sync kind: the whole document is sent on every change
+_FULL_SYNC = 1
+# LSP message type of the messages logged to the editor
+_LOG_INFO = 3
+
+# Parts of a module (see `PARSE_OUTPUTS`) only compiled for saved documents:
+# compiling the metadata takes several times longer than the AST, the rules
+# needing it don't run on every edit
+_SAVED_ONLY_OUTPUTS = frozenset({"metadata"})
+
+# Position of the error in the messages of the compiler
+_ERROR_POSITION = re.compile(r"line (\d+):(\d+)")
+
+
+@dataclass
+class _Document:
+    """A document open in the editor."""
+
+    uri: str
+    text: str
+    version: int | None
+    # Whether the text may differ from the file on disk
+    unsaved: bool
+
+
+class LanguageServer:
+    """
+    Answer the LSP messages of an editor, see the module documentation.
+
+    Messages are handled by `handle_message` as they arrive, and documents
+    are linted by a worker thread. The messages to the editor are passed to
+    `send`, from either thread.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict[str, Any]], None],
+        cache: CompileCache | None = None,
+        engine: str | None = None,
+        debounce: float = 0.3,
+    ):
+        self.send = send
+        self.cache = cache
+        self.engine = engine
+        self.debounce = debounce
+        self.context: ProjectContext | None = None
+        self.rules: list[Rule] = []
+        # Rules run on documents with unsaved changes
+        self._unsaved_rules: list[Rule] = []
+        self.initialized = False
+        self.shutdown_requested = False
+        self.exit_code: int | None = None
+
+        # State shared with the worker, guarded by the condition's lock
+        self._condition = threading.Condition()
+        self._documents: dict[Path, _Document] = {}
+        # Documents to lint, with the time they are due and whether their
+        # file changed on disk
+        self._scheduled: dict[Path, tuple[float, bool]] = {}
+        # Document being linted, and the event cancelling its compilation
+        self._in_flight: tuple[Path, threading.Event] | None = None
+        self._stopped = False
+        self._worker: threading.Thread | None = None
+
+        self._handlers: dict[str, Callable[[dict[str, Any]], Any]] = {
+            "initialize": self.initialize,
+            "shutdown": self.shutdown,
+            "exit": self.exit,
+            "textDocument/didOpen": self.did_open,
+            "textDocument/didChange": self.did_change,
+            "textDocument/didSave": self.did_save,
+            "textDocument/didClose": self.did_close,
+        }
+
+    def handle_message(self, message: dict[str, Any]) -> None:
+        """Handle a request or notification from the editor."""
+        method = message.get("method")
+        if not isinstance(method, str):
+            # The server sends no request, so there is no response to handle
+            return
+        is_request = "id" in message
+        request_id = message.get("id")
+
+        handler = self._handlers.get(method)
+        if handler is None:
+            # Unknown notifications, e.g. `$/cancelRequest` for a request
+            # that was already answered, are ignored
+            if is_request:
+                self._send_error(
+                    request_id, METHOD_NOT_FOUND, f"Unknown method: {method}"
+                )
+            return
+        if method == "initialize" and self.initialized:
+            # A second worker would race the first one on the same project
+            if is_request:
+                self._send_error(
+                    request_id, INVALID_REQUEST, "Server already initialized"
+                )
+            return
+        if not self.initialized and method not in ("initialize", "exit"):
+            if is_request:
+                self._send_error(
+                    request_id, SERVER_NOT_INITIALIZED, "Server not initialized"
+                )
+            return
+
+        try:
+            result = handler(message.get("params") or {})
+        except Exception as e:
+            if is_request:
+                self._send_error(request_id, SERVER_ERROR, str(e))
+            else:
+                self.log(f"Error handling {method}: {e}")
+            return
+        if is_request:
+            self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def initialize(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Set up the project, with the configuration of the workspace."""
+        root_uri = params.get("rootUri")
+        if isinstance(root_uri, str) and (root := _uri_to_path(root_uri)):
+            # pyproject.toml and the import paths are found from the working
+            # directory, like when natrix runs in the workspace
+            os.chdir(root)
+
+        config = read_pyproject_config()
+        select = config["select"]
+        disabled_rules = config["disabled_rules"]
+        min_severity = config["min_severity"]
+        self.rules = RuleRegistry.instantiate_rules(
+            config["rule_configs"],
+            select=select,
+            disabled_rules=disabled_rules,
+            min_severity=min_severity,
+        )
+        # Open documents are added as they are linted
+        self.context = ProjectContext(
+            [],
+            extra_paths=tuple(config["path"]),
+            cache=self.cache,
+            engine=self.engine or config["compiler_engine"],
+            # Only compile what the enabled rules consume
+            outputs=RuleRegistry.get_required_outputs(
+                disabled_rules, select=select, min_severity=min_severity
+            ),
+        )
+
+        self._unsaved_rules = [
+            rule
+            for rule in self.rules
+            if rule.instance is None or not rule.instance.REQUIRES & _SAVED_ONLY_OUTPUTS
+        ]
+
+        self.initialized = True
+        self._worker = threading.Thread(target=self._run_worker, daemon=True)
+        self._worker.start()
+        return {
+            "capabilities": {
+                "textDocumentSync": {
+                    "openClose": True,
+                    "change": _FULL_SYNC,
+                    "save": {"includeText": False},
+                }
+            },
+            "serverInfo": {"name": "natrix", "version": __version__},
+        }
+
+    def shutdown(self, params: dict[str, Any]) -> None:  # noqa: ARG002
+        """Stop linting, the editor exits the server next."""
+        self.shutdown_requested = True
+        self.stop()
+
+    def exit(self, params: dict[str, Any]) -> None:  # noqa: ARG002
+        """Exit, successfully only if the server was shut down first."""
+        self.stop()
+        self.exit_code = 0 if self.shutdown_requested else 1
+
+    def did_open(self, params: dict[str, Any]) -> None:
+        text_document = params["textDocument"]
+        path = _document_path(text_document["uri"])
+        if path is None:
+            return
+        text = text_document["text"]
+        try:
+            unsaved = path.read_text(encoding="utf-8") != text
+        except (OSError, UnicodeDecodeError):
+            unsaved = True
+        with self._condition:
+            self._documents[path] = _Document(
+                text_document["uri"], text, text_document.get("version"), unsaved
+            )
+        self._schedule(path, delay=0)
+
+    def did_change(self, params: dict[str, Any]) -> None:
+        text_document = params["textDocument"]
+        path = _document_path(text_document["uri"])
+        if path is None or not params["contentChanges"]:
+            return
+        with self._condition:
+            document = self._documents.get(path)
+            if document is None:
+                return
+            # With full sync, every change holds the whole document
+            document.text = params["contentChanges"][-1]["text"]
+            document.version = text_document.get("version")
+            document.unsaved = True
+        self._schedule(path, delay=self.debounce)
+
+    def did_save(self, params: dict[str, Any]) -> None:
+        path = _document_path(params["textDocument"]["uri"])
+        if path is None:
+            return
+        with self._condition:
+            document = self._documents.get(path)
+            if document is not None:
+                if "text" in params:
+                    document.text = params["text"]
+                document.unsaved = False
+        # The modules importing the file are recompiled as well
+        self._schedule(path, delay=0, saved=True)
+
+    def did_close(self, params: dict[str, Any]) -> None:
+        uri = params["textDocument"]["uri"]
+        path = _document_path(uri)
+        if path is None:
+            return
+        with self._condition:
+            document = self._documents.pop(path, None)
+            self._cancel(path)
+            self._scheduled.pop(path, None)
+        if document is not None and document.unsaved:
+            # Go back to the file on disk, for the documents importing it
+            self._schedule(path, delay=0, saved=True)
+        self._publish(uri, None, [])
+
+    def log(self, message: str) -> None:
+        """Show a message in the log of the editor."""
+        self._notify("window/logMessage", {"type": _LOG_INFO, "message": message})
+
+    def stop(self) -> None:
+        """Stop the worker, once the document being linted is done."""
+        with self._condition:
+            self._stopped = True
+            if self._in_flight is not None:
+                self._cancel(self._in_flight[0])
+            self._condition.notify()
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join()
+
+    def _schedule(self, path: Path, delay: float, saved: bool = False) -> None:
+        """Lint a document after `delay` seconds, unless it changes again."""
+        with self._condition:
+            _, was_saved = self._scheduled.get(path, (0.0, False))
+            self._scheduled[path] = (time.monotonic() + delay, saved or was_saved)
+            # The compilation in flight is outdated
+            self._cancel(path)
+            self._condition.notify()
+
+    def _cancel(self, path: Path) -> None:
+        if self._in_flight is not None and self._in_flight[0] == path:
+            self._in_flight[1].set()
+
+    def _run_worker(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    timeout = None
+                    if self._scheduled:
+                        path, (due, saved) = min(
+                            self._scheduled.items(), key=lambda item: item[1][0]
+                        )
+                        timeout = due - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self._condition.wait(timeout)
+                del self._scheduled[path]
+                cancel = threading.Event()
+                self._in_flight = (path, cancel)
+
+            try:
+                self._lint(path, saved, cancel)
+            except Exception as e:
+                self.log(f"Error linting {path}: {e}")
+            finally:
+                with self._condition:
+                    self._in_flight = None
+
+    def _lint(self, path: Path, saved: bool, cancel: threading.Event) -> None:
+        """Recompile a document and publish the issues of the affected ones."""
+        assert self.context is not None
+        to_lint = [path]
+        if saved:
+            try:
+                to_lint = [path, *self.context.update([path])]
+            except Exception as e:
+                self._publish_error(path, e)
+                return
+
+        for file_path in dict.fromkeys(to_lint):
+            with self._condition:
+                document = self._documents.get(file_path)
+                if document is None:
+                    continue
+                text, unsaved = document.text, document.unsaved
+                # The diagnostics are for this version, even if it changes
+                version = document.version
+
+            # Only the edited document is compiled again soon
+            file_cancel = cancel if file_path == path else None
+            rules = self.rules
+            try:
+                if unsaved:
+                    self.context.update_module(
+                        file_path,
+                        text,
+                        outputs=self.context.outputs - _SAVED_ONLY_OUTPUTS,
+                        cancel=file_cancel,
+                    )
+                    rules = self._unsaved_rules
+                elif file_path not in self.context.initial_files:
+                    self.context.update_module(file_path, cancel=file_cancel)
+            except CompilationCancelledError:
+                continue
+            except Exception as e:
+                self._publish_for(
+                    file_path, document, version, [error_to_diagnostic(e)]
+                )
+                continue
+
+            formatter = OutputFormatter(json_mode=True)
+            issues = lint_file(file_path, self.context, formatter, rules=rules)
+            for message in formatter.messages:
+                self.log(message)
+            self._publish_for(
+                file_path,
+                document,
+                version,
+                [issue_to_diagnostic(issue) for issue in issues],
+            )
+
+    def _publish_error(self, path: Path, error: Exception) -> None:
+        with self._condition:
+            document = self._documents.get(path)
+            if document is None:
+                return
+            version = document.version
+        self._publish_for(path, document, version, [error_to_diagnostic(error)])
+
+    def _publish_for(
+        self,
+        path: Path,
+        document: _Document,
+        version: int | None,
+        diagnostics: list[dict[str, Any]],
+    ) -> None:
+        with self._condition:
+            # The document was closed while it was linted
+            if self._documents.get(path) is not document:
+                return
+        self._publish(document.uri, version, diagnostics)
+
+    def _publish(
+        self, uri: str, version: int | None, diagnostics: list[dict[str, Any]]
+    ) -> None:
+        params: dict[str, Any] = {"uri": uri, "diagnostics": diagnostics}
+        if version is not None:
+            params["version"] = version
+        self._notify("textDocument/publishDiagnostics", params)
+
+    def _notify(self, method: str, params: dict[str, Any]) -> None:
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _send_error(self, request_id: Any, code: int, message: str) -> None:
+        self.send(
+            {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": code, "message": message},
+            }
+        )
+
+
+def issue_to_diagnostic(issue: Issue) -> dict[str, Any]:
+    """Convert an issue to an LSP diagnostic."""
+    start_line, start_character = issue.start_position or (1, 0)
+    end_line, end_character = issue.end_position or (start_line, start_character)
+    return {
+        # LSP lines are 0-based, the compiler's are 1-based
+        "range": {
+            "start": {"line": start_line - 1, "character": start_character},
+            "end": {"line": end_line - 1, "character": end_character},
+        },
+        "severity": _DIAGNOSTIC_SEVERITIES.get(issue.severity, 2),
+        "code": issue.code,
+        "source": "natrix",
+        "message": issue.message,
+    }
+
+
+def error_to_diagnostic(error: Exception) -> dict[str, Any]:
+    """Convert a compilation error to an LSP diagnostic at its position."""
+    message = str(error)
+    # Keep the compiler's message, without natrix's preamble
+    _, found, compiler_message = message.partition("following error:")
+    if found:
+        message = compiler_message
+    message = message.strip()
+
+    line, character = 0, 0
+    match = _ERROR_POSITION.search(message)
+    if match:
+        line, character = int(match.group(1)) - 1, int(match.group(2))
+    position = {"line": line, "character": character}
+    return {
+        "range": {"start": position, "end": position},
+        "severity": _ERROR_SEVERITY,
+        "source": "natrix",
+        "message": message,
+    }
+
+
+def _uri_to_path(uri: str) -> Path | None:
+    parsed = urlparse(uri)
+    if parsed.scheme != "file":
+        return None
+    return Path(url2pathname(parsed.path)).resolve()
+
+
+def _document_path(uri: str) -> Path | None:
+    """Return the path of a document natrix lints, None for other documents."""
+    path = _uri_to_path(uri)
+    if path is None or path.suffix not in VYPER_EXTENSIONS:
+        return None
+    return path
+
+
+def read_message(stream: IO[bytes]) -> dict[str, Any] | None:
+    """Read an LSP message, returns None at the end of the stream."""
+    content_length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            # The headers end with an empty line
+            if content_length is not None:
+                break
+            continue
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value)
+
+    message: dict[str, Any] = json.loads(stream.read(content_length))
+    return message
+
+
+def write_message(stream: IO[bytes], message: dict[str, Any]) -> None:
+    """Write an LSP message."""
+    body = json.dumps(message).encode()
+    stream.write(b"Content-Length: %d\r\n\r\n%b" % (len(body), body))
+    stream.flush()
+
+
+def serve_lsp(
+    cache: CompileCache | None = None,
+    engine: str | None = None,
+    debounce: float = 0.3,
+    stdin: IO[bytes] | None = None,
+    stdout: IO[bytes] | None = None,
+) -> int:
+    """
+    Run a language server on stdin and stdout until the editor exits it.
+
+    Returns:
+        The exit code of the server
+    """
+    stdin = sys.stdin.buffer if stdin is None else stdin
+    stdout = sys.stdout.buffer if stdout is None else stdout
+    send_lock = threading.Lock()
+
+    def send(message: dict[str, Any]) -> None:
+        with send_lock:
+            write_message(stdout, message)
+
+    server = LanguageServer(send, cache=cache, engine=engine, debounce=debounce)
+    # Anything printed would corrupt the messages to the editor
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            while server.exit_code is None:
+                message = read_message(stdin)
+                if message is None:
+                    break
+                server.handle_message(message)
+        finally:
+            server.stop()
+
+    if server.exit_code is None:
+        # The editor went away without exiting the server
+        return 0 if server.shutdown_requested else 1
+    return server.exit_code
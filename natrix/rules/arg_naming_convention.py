@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import re
+from typing import TYPE_CHECKING
 
-from natrix.ast_node import FunctionDefNode, Node
 from natrix.rules.common import BaseRule, RuleRegistry
 
+if TYPE_CHECKING:
+    from natrix.ast_node import FunctionDefNode
+
 
 @RuleRegistry.register
 class ArgNamingConventionRule(BaseRule):
@@ -21,13 +24,14 @@ class ArgNamingConventionRule(BaseRule):
     """
 
     CODE = "NTX11"
+    SEVERITY = "warning"
     MESSAGE = (
         "Function '{}' argument '{}' does not match the naming convention pattern '{}'."
     )
 
     def __init__(self, pattern: str = r"^_") -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
@@ -35,8 +39,7 @@ class ArgNamingConventionRule(BaseRule):
 
     def visit_FunctionDef(self, node: FunctionDefNode) -> None:
         # Collect declared arguments in a dictionary, {arg_name: arg_node}
-        for arg_info in node.get("args.args"):
-            arg_node = Node(arg_info)
+        for arg_node in node.get_descendants("arg"):
             arg_name = arg_node.get("arg")
             if arg_name is not None and not self.pattern.match(arg_name):
                 self.add_issue(
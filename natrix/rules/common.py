@@ -6,16 +6,19 @@ import inspect
 import pkgutil
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, ClassVar
+from typing import TYPE_CHECKING, Any, ClassVar, cast
+
+from natrix.ast_tools import PARSE_OUTPUTS, MultiVisitor, VyperASTVisitor
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Collection, Sequence
 
-from natrix.ast_node import Node
-from natrix.ast_tools import VyperASTVisitor
+    from natrix.ast_node import Node
+    from natrix.context import ModuleInfo, ProjectContext
 
-if TYPE_CHECKING:
-    from natrix.context import ProjectContext
+
+# Issue severities, from the least to the most important
+SEVERITY_LEVELS = ("style", "optimization", "warning", "important")
 
 
 @dataclass(frozen=True)
@@ -23,6 +26,8 @@ class Rule:
     name: str
     description: str
     run: Callable
+    code: str | None = None
+    instance: BaseRule | None = None
 
 
 @dataclass(frozen=True)
@@ -71,6 +76,7 @@ class Issue:
 class RuleRegistry:
     _rules: ClassVar[dict[str, type[BaseRule]]] = {}
     _rule_instances: ClassVar[list[Rule] | None] = None
+    _discovered: ClassVar[bool] = False
 
     @classmethod
     def register(cls, rule_class: type[BaseRule]) -> type[BaseRule]:
@@ -86,28 +92,84 @@ class RuleRegistry:
         """Get all registered rule classes"""
         return cls._rules.copy()
 
+    @classmethod
+    def select_rule_classes(
+        cls,
+        select: Collection[str] | None = None,
+        disabled_rules: Collection[str] = (),
+        min_severity: str | None = None,
+    ) -> dict[str, type[BaseRule]]:
+        """
+        Get the registered rule classes that should run.
+
+        Args:
+            select: Codes of the rules to run, all rules run if None.
+            disabled_rules: Codes of the rules to skip, takes precedence
+                over `select`.
+            min_severity: Skip rules whose severity is lower than this one
+                (see `SEVERITY_LEVELS`).
+        """
+        cls.discover_rules()
+
+        min_level = SEVERITY_LEVELS.index(min_severity) if min_severity else 0
+
+        selected = {}
+        for rule_name, rule_class in cls._rules.items():
+            code = getattr(rule_class, "CODE", None)
+            if select is not None and code not in select:
+                continue
+            if code in disabled_rules:
+                continue
+            severity = getattr(rule_class, "SEVERITY", None)
+            if severity in SEVERITY_LEVELS and (
+                SEVERITY_LEVELS.index(severity) < min_level
+            ):
+                continue
+            selected[rule_name] = rule_class
+
+        return selected
+
     @classmethod
     def get_rules(
-        cls, rule_configs: dict[str, dict[str, Any]] | None = None
+        cls,
+        rule_configs: dict[str, dict[str, Any]] | None = None,
+        select: Collection[str] | None = None,
+        disabled_rules: Collection[str] = (),
+        min_severity: str | None = None,
     ) -> list[Rule]:
         """
         Get or create rule instances with the given configurations.
-        Rules are discovered and instantiated only once per run.
+        Rules are discovered and instantiated only once per run, rules
+        excluded by the selection (see `select_rule_classes`) are never
+        instantiated.
         """
         # If rules have already been instantiated, return them
-        if cls._rule_instances is not None:
-            return cls._rule_instances
-
-        # Ensure rules are discovered
-        cls.discover_rules()
+        if cls._rule_instances is None:
+            cls._rule_instances = cls.instantiate_rules(
+                rule_configs, select, disabled_rules, min_severity
+            )
+        return cls._rule_instances
 
+    @classmethod
+    def instantiate_rules(
+        cls,
+        rule_configs: dict[str, dict[str, Any]] | None = None,
+        select: Collection[str] | None = None,
+        disabled_rules: Collection[str] = (),
+        min_severity: str | None = None,
+    ) -> list[Rule]:
+        """
+        Create new instances of the selected rules with the given
+        configurations, see `get_rules` for the instances shared by a run.
+        """
         # Initialize with empty config if none provided
         if rule_configs is None:
             rule_configs = {}
 
         # Create rule instances
-        cls._rule_instances = []
-        for rule_name, rule_class in cls._rules.items():
+        rule_instances = []
+        selected_rules = cls.select_rule_classes(select, disabled_rules, min_severity)
+        for rule_name, rule_class in selected_rules.items():
             # Get the parameters for this rule's __init__ method
             params = {}
             if rule_name in rule_configs:
@@ -127,26 +189,49 @@ class RuleRegistry:
                 rule_doc_lines = rule_doc.splitlines()
 
                 # Create the Rule object
-                cls._rule_instances.append(
+                rule_instances.append(
                     Rule(
                         name=rule_doc_lines[0].strip() if rule_doc_lines else rule_name,
                         description="\n".join(
                             line.strip() for line in rule_doc_lines[1:] if line.strip()
                         ),
                         run=rule_instance.run,
+                        code=rule_instance.code,
+                        instance=rule_instance,
                     )
                 )
             except Exception as e:
                 print(f"Error instantiating rule {rule_name}: {e}")
 
-        return cls._rule_instances
+        return rule_instances
+
+    @classmethod
+    def get_required_outputs(
+        cls,
+        disabled_rules: Collection[str] = (),
+        select: Collection[str] | None = None,
+        min_severity: str | None = None,
+    ) -> frozenset[str]:
+        """
+        Get the parts of a module (see `PARSE_OUTPUTS`) that the compiler must
+        produce for the selected rules.
+        """
+        required: set[str] = set()
+        selected_rules = cls.select_rule_classes(select, disabled_rules, min_severity)
+        for rule_class in selected_rules.values():
+            required.update(rule_class.REQUIRES)
+
+        return frozenset(required.intersection(PARSE_OUTPUTS))
 
     @classmethod
     def discover_rules(cls, rules_package: str = "natrix.rules") -> None:
         """Discover all rule classes in the given package"""
-        # Skip discovery if rules have already been discovered
-        if cls._rules:
+        # Skip discovery if rules have already been discovered. Checking
+        # `_rules` instead isn't enough, importing a single rule module
+        # registers it
+        if cls._discovered:
             return
+        cls._discovered = True
 
         # Get the package directory in a way that works without __init__.py
         package_parts = rules_package.split(".")
@@ -174,9 +259,18 @@ class RuleRegistry:
         """Reset the registry (mainly for testing purposes)"""
         cls._rules = {}
         cls._rule_instances = None
+        cls._discovered = False
 
 
 class BaseRule(VyperASTVisitor):
+    # The data the rule consumes. The compiler is only asked for the parts
+    # of a module that at least one enabled rule needs:
+    # - "ast": the annotated AST
+    # - "comments": the source code comments
+    # - "metadata": the compiler metadata (e.g. function frame sizes)
+    # - "source": the source code, used for issue snippets
+    REQUIRES: ClassVar[frozenset[str]] = frozenset({"ast", "source"})
+
     def __init__(self, severity: str, code: str, message: str):
         self.results: list[Any] = []
         self.severity = severity
@@ -186,16 +280,29 @@ class BaseRule(VyperASTVisitor):
         self.source_code: str | None = None
         self.file_path: Path | None = None
         self.context: ProjectContext | None = None
+        self.module_info: ModuleInfo | None = None
 
     def run(self, project_context: ProjectContext, file_path: Path) -> list[Issue]:
+        module_info = self.begin_run(project_context, file_path)
+        self.visit(module_info.ast_node)
+        return self.end_run()
+
+    def begin_run(self, project_context: ProjectContext, file_path: Path) -> ModuleInfo:
+        """
+        Prepare the rule for a traversal of `file_path` and return the module
+        to traverse.
+        """
         self.issues = []  # reset issues for each run
         self.context = project_context
         self.file_path = file_path
 
-        # Get the module info from the context
-        module_info = self.context.get_module(file_path)
+        # Get the module info from the context, compiling the parts of the
+        # module this rule needs that were skipped while building the graph
+        module_info = self.context.ensure_outputs(
+            file_path, self.REQUIRES.intersection(PARSE_OUTPUTS)
+        )
 
-        self.compiler_output = Node(module_info.compiler_output)
+        self.module_info = module_info
 
         # The source code is loaded only once when needed
         self.source_code = None
@@ -204,8 +311,17 @@ class BaseRule(VyperASTVisitor):
         if hasattr(self, "before_traversal"):
             self.before_traversal()
 
-        self.visit(module_info.ast_node)
+        return module_info
+
+    @property
+    def compiler_output(self) -> Node:
+        """Node view of the compiler output of the module being linted."""
+        if self.module_info is None:
+            raise ValueError("The rule is not running on a module.")
+        return self.module_info.compiler_output_node
 
+    def end_run(self) -> list[Issue]:
+        """Finish the traversal started by `begin_run` and return the issues."""
         # Call after_traversal hook if it exists
         if hasattr(self, "after_traversal"):
             self.after_traversal()
@@ -279,3 +395,53 @@ class BaseRule(VyperASTVisitor):
             end_position=(end_line, end_character),
         )
         self.issues.append(issue)
+
+
+def run_rules(
+    rules: Sequence[BaseRule],
+    project_context: ProjectContext,
+    file_path: Path,
+    on_error: Callable[[BaseRule, Exception], None] | None = None,
+) -> list[Issue]:
+    """
+    Run several rules on a file, walking its AST only once.
+
+    The issues are returned grouped by rule, in the order of `rules`, as if
+    each rule had been run on its own. A rule raising an exception is
+    reported through `on_error` (or the exception propagates if it is None)
+    and its issues are discarded, the other rules are unaffected.
+    """
+    failed: set[int] = set()
+
+    def report(rule: BaseRule, e: Exception) -> None:
+        if on_error is None:
+            raise e
+        failed.add(id(rule))
+        on_error(rule, e)
+
+    module_info = None
+    started = []
+    for rule in rules:
+        try:
+            module_info = rule.begin_run(project_context, file_path)
+            started.append(rule)
+        except Exception as e:
+            report(rule, e)
+
+    if module_info is not None:
+        dispatcher = MultiVisitor(
+            started,
+            on_error=lambda visitor, e: report(cast("BaseRule", visitor), e),
+        )
+        dispatcher.visit(module_info.ast_node)
+
+    issues = []
+    for rule in started:
+        if id(rule) in failed:
+            continue
+        try:
+            issues.extend(rule.end_run())
+        except Exception as e:
+            report(rule, e)
+
+    return issues
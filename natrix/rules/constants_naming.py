@@ -17,11 +17,12 @@ class ConstantNamingRule(BaseRule):
     """
 
     CODE = "NTX2"
+    SEVERITY = "style"
     MESSAGE = "Constant '{}' should be named in UPPER_SNAKE_CASE"
 
     def __init__(self) -> None:
         super().__init__(
-            severity="style",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
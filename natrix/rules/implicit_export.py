@@ -18,6 +18,7 @@ class ImplicitExportRule(BaseRule):
     """
 
     CODE = "NTX9"
+    SEVERITY = "important"
     MESSAGE = (
         "Module '{}' is exposing all its functions using `__interface__`. "
         "Consider exporting them one by one to make the contract more explicit. "
@@ -27,7 +28,7 @@ class ImplicitExportRule(BaseRule):
 
     def __init__(self) -> None:
         super().__init__(
-            severity="important",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
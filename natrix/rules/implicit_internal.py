@@ -17,11 +17,12 @@ class ImplicitInternalRule(BaseRule):
     """
 
     CODE = "NTX3"
+    SEVERITY = "style"
     MESSAGE = "Internal function '{}' is missing the '@internal' decorator."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="style",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
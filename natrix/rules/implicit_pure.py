@@ -17,11 +17,12 @@ class ImplicitPureRule(BaseRule):
     """
 
     CODE = "NTX5"
+    SEVERITY = "style"
     MESSAGE = "Function '{}' does not access state but is not marked as 'pure'."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="style",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
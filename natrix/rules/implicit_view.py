@@ -17,11 +17,12 @@ class ImplicitViewRule(BaseRule):
     """
 
     CODE = "NTX4"
+    SEVERITY = "style"
     MESSAGE = "Function '{}' reads contract state but is not marked as 'view'."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="style",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
@@ -19,11 +19,13 @@ class MemoryExpansionRule(BaseRule):
     """
 
     CODE = "NTX1"
+    SEVERITY = "warning"
     MESSAGE = "Function '{}' has a large frame size of {} bytes."
+    REQUIRES = BaseRule.REQUIRES | {"metadata"}
 
     def __init__(self, max_frame_size: int = 20_000) -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
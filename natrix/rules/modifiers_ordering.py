@@ -18,6 +18,7 @@ class ModifiersOrderingRule(BaseRule):
     """
 
     CODE = "NTX12"
+    SEVERITY = "style"
     MESSAGE = (
         "Function '{}' has modifiers in incorrect order. "
         "Expected order: visibility (@external/@internal/@deploy), "
@@ -35,7 +36,7 @@ class ModifiersOrderingRule(BaseRule):
 
     def __init__(self) -> None:
         super().__init__(
-            severity="style",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
@@ -17,11 +17,12 @@ class PrintLeftRule(BaseRule):
     """
 
     CODE = "NTX6"
+    SEVERITY = "warning"
     MESSAGE = "Found a 'print' statement; consider removing it in production code."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
@@ -60,6 +60,7 @@ class CacheStorageVariableRule(BaseRule):
     """
 
     CODE = "NTX7"
+    SEVERITY = "optimization"
     MESSAGE = (
         "Storage variable '{}' is accessed multiple times; "
         "consider caching it to save gas."
@@ -67,7 +68,7 @@ class CacheStorageVariableRule(BaseRule):
 
     def __init__(self) -> None:
         super().__init__(
-            severity="optimization",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
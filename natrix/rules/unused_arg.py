@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from natrix.ast_node import FunctionDefNode, Node
+from typing import TYPE_CHECKING
+
 from natrix.rules.common import BaseRule, RuleRegistry
 
+if TYPE_CHECKING:
+    from natrix.ast_node import FunctionDefNode
+
 
 @RuleRegistry.register
 class UnusedArgRule(BaseRule):
@@ -17,11 +21,12 @@ class UnusedArgRule(BaseRule):
     """
 
     CODE = "NTX10"
+    SEVERITY = "warning"
     MESSAGE = "Function '{}' argument '{}' is never used."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
@@ -33,18 +38,19 @@ class UnusedArgRule(BaseRule):
 
         # Collect declared arguments in a dictionary, {arg_name: arg_node}
         declared_args = {}
-        for arg_info in node.get("args.args"):
-            arg_node = Node(arg_info)
+        for arg_node in node.get_descendants("arg"):
             arg_name = arg_node.get("arg")
             if arg_name is not None:
                 declared_args[arg_name] = arg_node
 
         # Gather all 'Name' nodes to see which arguments actually appear
         # in the function body
-        all_names = node.get_descendants(node_type="Name")
-        for name_node in all_names:
+        for name_node in node.iter_descendants(node_type="Name"):
             used_name = name_node.get("id")
             declared_args.pop(used_name, None)  # Remove used arguments
+            if not declared_args:
+                # Every argument is used, no need to look further
+                break
 
         # Report any remaining arguments that were never used
         for unused_arg, arg_node in declared_args.items():
@@ -25,11 +25,12 @@ class UnusedEventRule(BaseRule):
     """
 
     CODE = "NTX13"
+    SEVERITY = "warning"
     MESSAGE = "Event '{}' is defined but never emitted."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
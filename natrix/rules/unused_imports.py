@@ -21,11 +21,12 @@ class UnusedImportsRule(BaseRule):
     """
 
     CODE = "NTX14"
+    SEVERITY = "warning"
     MESSAGE = "Import '{}' is not used."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
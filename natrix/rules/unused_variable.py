@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+from bisect import bisect_right
 from typing import TYPE_CHECKING
 
 from natrix.rules.common import BaseRule, RuleRegistry
 
 if TYPE_CHECKING:
-    from natrix.ast_node import FunctionDefNode
+    from natrix.ast_node import FunctionDefNode, Node
 
 
 @RuleRegistry.register
@@ -24,11 +25,12 @@ class UnusedVariableRule(BaseRule):
     """
 
     CODE = "NTX8"
+    SEVERITY = "warning"
     MESSAGE = "Variable '{}' is declared but never used."
 
     def __init__(self) -> None:
         super().__init__(
-            severity="warning",
+            severity=self.SEVERITY,
             code=self.CODE,
             message=self.MESSAGE,
         )
@@ -51,7 +53,7 @@ class UnusedVariableRule(BaseRule):
                 assigned_var_nodes[var_name] = assign
 
         # Gather the node IDs for these assignments
-        assigned_var_node_ids = [assign.get("target.node_id") for assign in all_assigns]
+        assigned_var_node_ids = {assign.get("target.node_id") for assign in all_assigns}
 
         # Collect all 'Name' nodes in the function
         all_names = node.get_descendants(node_type="Name")
@@ -64,22 +66,26 @@ class UnusedVariableRule(BaseRule):
         # Determine which assigned variables are actually used
         used_var_names = set()
         for name in candidate_assigned_names:
-            if name.get("node_id") not in assigned_var_node_ids:
+            if name.node_id not in assigned_var_node_ids:
                 used_var_names.add(name.get("id"))
 
+        # Group the 'Name' nodes by id, they are in preorder
+        names_by_id: dict[str, list[Node]] = {}
+        for name in all_names:
+            names_by_id.setdefault(name.get("id"), []).append(name)
+
         # Collect all for loop target variables and map them to their correct nodes
         for_loop_targets = {}
         for_loops = node.get_descendants(node_type="For")
         for for_loop in for_loops:
             target_name = for_loop.get("target.target.id")
             if target_name is not None:
-                # Find the Name node with the correct id and position
-                target_nodes = for_loop.get_descendants(
-                    node_type="Name", filters={"id": target_name}
-                )
-                if target_nodes:
-                    # Use the first matching Name node
-                    for_loop_targets[target_name] = target_nodes[0]
+                # The first Name node with the target id positioned after the
+                # loop is the loop variable, if it lies within the loop
+                names = names_by_id.get(target_name, [])
+                i = bisect_right(names, for_loop.enter, key=lambda n: n.enter)
+                if i < len(names) and for_loop.is_ancestor_of(names[i]):
+                    for_loop_targets[target_name] = names[i]
 
         # Check if this is a constructor function using the built-in property
         is_constructor = node.is_constructor
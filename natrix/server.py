@@ -0,0 +1,534 @@
+"""
+Long running server answering lint and codegen requests.
+
+`natrix serve` keeps the compiled projects, the rule registry and the
+compiler output cache in memory between requests, so that a request only
+pays for the files that changed since the previous one. Requests are
+JSON-RPC 2.0 messages, one per line, read from stdin or a Unix socket:
+
+- `lint`: lint `files` (files or directories) with the given `extra_paths`,
+  `engine`, `rule_configs`, `select`, `disabled_rules` and `min_severity`.
+  The result holds the `issues`, in the schema of `natrix lint --json`, and
+  the `messages` printed while linting.
+- `exports` and `call_graph`: the output of the codegen commands for
+  `file_path` (and `function`, for the call graph).
+- `shutdown`: stop the server.
+
+Every request may also give the `cwd` and the `env_path` (the `PATH`
+environment variable) of the client. They decide which compiler runs and
+where imports are searched, so the request is answered in that directory
+with that `PATH`, like the command would run in the client.
+
+`natrix client` forwards natrix commands to a running server.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+from natrix import (
+    VYPER_EXTENSIONS,
+    OutputFormatter,
+    find_vy_files,
+    issue_from_json,
+    issue_to_json,
+    lint_files,
+    main,
+    parse_args,
+    read_pyproject_config,
+    resolve_lint_options,
+)
+from natrix.ast_tools import COMPILER_ENGINES
+from natrix.cache import default_cache_dir
+from natrix.codegen import generate_call_graph, generate_exports
+from natrix.context import ProjectContext
+from natrix.rules.common import SEVERITY_LEVELS, RuleRegistry
+from natrix.watch import FileWatcher
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from natrix.cache import CompileCache
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+# Failure of a valid request, e.g. a module that doesn't compile
+SERVER_ERROR = -32000
+
+
+class RequestError(Exception):
+    """A JSON-RPC request that failed, with the code of the error."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def default_socket_path() -> Path:
+    """Return the Unix socket the server listens on by default."""
+    return default_cache_dir() / "server.sock"
+
+
+@dataclass
+class _Project:
+    """A compiled project, kept up to date with the files it depends on."""
+
+    context: ProjectContext
+    watcher: FileWatcher
+    # Changes which couldn't be compiled, retried with the next request
+    pending: set[Path] = field(default_factory=set)
+
+
+class NatrixServer:
+    """
+    Answer JSON-RPC requests, see the module documentation for the methods.
+
+    The projects linted are kept compiled, one per working directory, `PATH`,
+    set of extra paths and compiler engine. Before every request, the modules
+    that changed on disk are recompiled along with the modules importing
+    them, through `ProjectContext.update`.
+    """
+
+    # Number of projects kept compiled, the least recently used one is
+    # dropped first
+    MAX_PROJECTS = 8
+
+    def __init__(
+        self,
+        cache: CompileCache | None = None,
+        jobs: int = 1,
+        engine: str = "subprocess",
+    ):
+        self.cache = cache
+        self.jobs = jobs
+        self.engine = engine
+        self.running = True
+        self.projects: OrderedDict[
+            tuple[Path, str, tuple[Path, ...], str], _Project
+        ] = OrderedDict()
+        self._methods: dict[str, Callable[[dict[str, Any]], Any]] = {
+            "lint": self.lint,
+            "exports": self.exports,
+            "call_graph": self.call_graph,
+            "shutdown": self.shutdown,
+        }
+
+    def handle_message(self, message: str | bytes) -> dict[str, Any] | None:
+        """
+        Answer a JSON-RPC message. Returns the response, or None if the
+        message is a notification (a request without an id).
+        """
+        try:
+            request = json.loads(message)
+        except ValueError as e:
+            return _error_response(None, PARSE_ERROR, f"Parse error: {e}")
+
+        if (
+            not isinstance(request, dict)
+            or request.get("jsonrpc") != "2.0"
+            or not isinstance(request.get("method"), str)
+        ):
+            request_id = request.get("id") if isinstance(request, dict) else None
+            return _error_response(request_id, INVALID_REQUEST, "Invalid request")
+
+        request_id = request.get("id")
+        try:
+            method = self._methods.get(request["method"])
+            if method is None:
+                raise RequestError(
+                    METHOD_NOT_FOUND, f"Unknown method: {request['method']}"
+                )
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RequestError(INVALID_PARAMS, "Params must be an object")
+            with _client_environment(params):
+                result = method(params)
+        except RequestError as e:
+            response = _error_response(request_id, e.code, str(e))
+        except Exception as e:
+            response = _error_response(request_id, SERVER_ERROR, str(e))
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+        return response if "id" in request else None
+
+    def lint(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Lint the requested files, see the module documentation."""
+        files: list[Path] = []
+        for path in _get_paths(params, "files", required=True):
+            if path.is_dir():
+                files.extend(find_vy_files(path))
+            elif path.is_file() and path.suffix in VYPER_EXTENSIONS:
+                files.append(path)
+            else:
+                raise RequestError(
+                    INVALID_PARAMS, f"Not a Vyper file or directory: {path}"
+                )
+
+        rule_configs = _get_param(params, "rule_configs", dict, {})
+        select = _get_param(params, "select", list, None)
+        disabled_rules = set(_get_param(params, "disabled_rules", list, []))
+        min_severity = _get_param(params, "min_severity", str, None)
+        if min_severity is not None and min_severity not in SEVERITY_LEVELS:
+            raise RequestError(INVALID_PARAMS, f"Unknown severity: {min_severity}")
+        include_source = _get_param(params, "include_source", bool, False)
+
+        # Rules keep state while they run, every request gets its own
+        rules = RuleRegistry.instantiate_rules(
+            rule_configs,
+            select=set(select) if select is not None else None,
+            disabled_rules=disabled_rules,
+            min_severity=min_severity,
+        )
+        project = self._get_project(
+            files, tuple(_get_paths(params, "extra_paths")), self._get_engine(params)
+        )
+
+        formatter = OutputFormatter(json_mode=True)
+        issues = lint_files(
+            files,
+            project.context,
+            formatter,
+            disabled_rules,
+            jobs=self.jobs,
+            rules=rules,
+        )
+
+        issue_dicts = []
+        for issue in issues:
+            issue_dict = issue_to_json(issue)
+            # The snippets are only needed to print the issues like the CLI
+            if include_source:
+                issue_dict["source_code"] = issue.source_code
+            issue_dicts.append(issue_dict)
+        return {"issues": issue_dicts, "messages": formatter.messages}
+
+    def exports(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Generate the exports of a contract, like `natrix codegen exports`."""
+        output = generate_exports(
+            _get_file_path(params),
+            tuple(_get_paths(params, "extra_paths")),
+            cache=self.cache,
+            engine=self._get_engine(params),
+        )
+        return {"output": output}
+
+    def call_graph(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Generate the call graph of a contract, like `natrix codegen call_graph`."""
+        output = generate_call_graph(
+            _get_file_path(params),
+            tuple(_get_paths(params, "extra_paths")),
+            _get_param(params, "function", str, None),
+            cache=self.cache,
+            engine=self._get_engine(params),
+        )
+        return {"output": output}
+
+    def shutdown(self, params: dict[str, Any]) -> None:  # noqa: ARG002
+        """Stop the server once the request is answered."""
+        self.running = False
+
+    def _get_engine(self, params: dict[str, Any]) -> str:
+        engine: str = _get_param(params, "engine", str, self.engine)
+        if engine not in COMPILER_ENGINES:
+            raise RequestError(INVALID_PARAMS, f"Unknown compiler engine: {engine}")
+        return engine
+
+    def _get_project(
+        self, files: list[Path], extra_paths: tuple[Path, ...], engine: str
+    ) -> _Project:
+        """
+        Return the project compiling `files`, bringing it up to date with the
+        changes made since the previous request.
+        """
+        # The working directory and `PATH` of the client, see `_client_environment`
+        key = (Path.cwd(), os.environ.get("PATH", ""), extra_paths, engine)
+        project = self.projects.get(key)
+        if project is None:
+            # All the outputs are compiled, any selection of rules can run
+            context = ProjectContext(
+                files,
+                extra_paths=extra_paths,
+                cache=self.cache,
+                jobs=self.jobs,
+                engine=engine,
+            )
+            project = _Project(
+                context, FileWatcher((), VYPER_EXTENSIONS, context.modules)
+            )
+            self.projects[key] = project
+            if len(self.projects) > self.MAX_PROJECTS:
+                self.projects.popitem(last=False)
+            return project
+
+        self.projects.move_to_end(key)
+        project.pending |= project.watcher.poll()
+        # Files that weren't requested before are added to the project
+        project.pending.update(f for f in files if f not in project.context.modules)
+        if project.pending:
+            project.context.update(project.pending)
+            project.pending = set()
+            project.watcher.set_files(project.context.modules)
+        return project
+
+
+def _error_response(request_id: Any, code: int, message: str) -> dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def _get_param(params: dict[str, Any], name: str, kind: type, default: Any) -> Any:
+    value = params.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, kind):
+        raise RequestError(INVALID_PARAMS, f"'{name}' must be a {kind.__name__}")
+    return value
+
+
+@contextlib.contextmanager
+def _client_environment(params: dict[str, Any]) -> Iterator[None]:
+    """
+    Answer a request in the working directory and with the `PATH` of the
+    client, if given. They select the compiler, the Python environment whose
+    search paths are used for imports and the default search paths (e.g.
+    `lib/pypi`), which must be the ones of a local run.
+    """
+    cwd = _get_param(params, "cwd", str, None)
+    env_path = _get_param(params, "env_path", str, None)
+    if cwd is not None and not Path(cwd).is_dir():
+        raise RequestError(INVALID_PARAMS, f"Not a directory: {cwd}")
+
+    previous_cwd = Path.cwd()
+    previous_env_path = os.environ.get("PATH")
+    try:
+        if cwd is not None:
+            os.chdir(cwd)
+        if env_path is not None:
+            os.environ["PATH"] = env_path
+        yield
+    finally:
+        os.chdir(previous_cwd)
+        if previous_env_path is None:
+            os.environ.pop("PATH", None)
+        else:
+            os.environ["PATH"] = previous_env_path
+
+
+def _get_paths(params: dict[str, Any], name: str, required: bool = False) -> list[Path]:
+    paths = _get_param(params, name, list, None)
+    if paths is None:
+        if required:
+            raise RequestError(INVALID_PARAMS, f"Missing parameter: '{name}'")
+        return []
+    if not all(isinstance(path, str) for path in paths):
+        raise RequestError(INVALID_PARAMS, f"'{name}' must be a list of paths")
+    # Relative paths are resolved from the working directory of the client
+    return [Path(path).resolve() for path in paths]
+
+
+def _get_file_path(params: dict[str, Any]) -> Path:
+    file_path = _get_param(params, "file_path", str, None)
+    if file_path is None:
+        raise RequestError(INVALID_PARAMS, "Missing parameter: 'file_path'")
+    return Path(file_path).resolve()
+
+
+def _answer(server: NatrixServer, line: str | bytes) -> str | None:
+    """Answer a line holding a request, with the line holding the response."""
+    if not line.strip():
+        return None
+    response = server.handle_message(line)
+    if response is None:
+        return None
+    return json.dumps(response) + "\n"
+
+
+def serve_stdio(
+    server: NatrixServer,
+    stdin: Iterable[str] | None = None,
+    stdout: IO[str] | None = None,
+) -> None:
+    """Answer the requests read from stdin until shut down or stdin closes."""
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.stdout if stdout is None else stdout
+
+    for line in stdin:
+        # Anything printed while answering would corrupt the responses
+        with contextlib.redirect_stdout(sys.stderr):
+            response = _answer(server, line)
+        if response is not None:
+            stdout.write(response)
+            stdout.flush()
+        if not server.running:
+            break
+
+
+def serve_unix(
+    server: NatrixServer, socket_path: Path, connection_timeout: float = 5.0
+) -> None:
+    """
+    Answer the requests sent to a Unix socket until shut down. Connections
+    are served one at a time, each one may send several requests. A
+    connection sending nothing for `connection_timeout` seconds is closed,
+    so that it doesn't hold up the other clients.
+    """
+    if socket_path.exists():
+        if is_server_running(socket_path):
+            raise FileExistsError(f"A server is already listening on {socket_path}")
+        # Left behind by a server that didn't stop cleanly
+        socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def setup(self) -> None:
+            # Reads from a client that never sends its request time out
+            self.request.settimeout(connection_timeout)
+            super().setup()
+
+        def handle(self) -> None:
+            try:
+                for line in self.rfile:
+                    response = _answer(server, line)
+                    if response is not None:
+                        self.wfile.write(response.encode())
+                        self.wfile.flush()
+                    if not server.running:
+                        break
+            except TimeoutError:
+                pass
+
+    # The server can read any file its user can, keep the socket to that
+    # user from the moment it is created
+    previous_umask = os.umask(0o177)
+    try:
+        unix_server = socketserver.UnixStreamServer(str(socket_path), RequestHandler)
+    finally:
+        os.umask(previous_umask)
+
+    with unix_server:
+        try:
+            while server.running:
+                unix_server.handle_request()
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def is_server_running(socket_path: Path) -> bool:
+    """Check whether a server is listening on `socket_path`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def send_request(socket_path: Path, method: str, params: dict[str, Any]) -> Any:
+    """
+    Send a request to the server listening on `socket_path` and return its
+    result. Raises `RequestError` if the request failed.
+    """
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as response_file:
+            line = response_file.readline()
+
+    if not line:
+        raise RequestError(SERVER_ERROR, "The server closed the connection")
+    response = json.loads(line)
+    if "error" in response:
+        raise RequestError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+def run_client(argv: list[str], socket_path: Path) -> int:
+    """
+    Run a natrix command on the server listening on `socket_path`, printing
+    its output like the command would. Commands the server doesn't answer,
+    or all of them if no server is running, are run in this process.
+
+    Returns:
+        The exit code of the command
+    """
+    args = parse_args(argv)
+    forwarded = not args.version and (
+        (args.command == "lint" and not args.list_rules and not args.watch)
+        or (
+            args.command == "codegen"
+            and args.codegen_command in ("exports", "call_graph")
+        )
+    )
+    if not forwarded or not is_server_running(socket_path):
+        # Exits with the status of the command
+        main(argv)
+        return 0
+
+    extra_paths = [str(Path(path).resolve()) for path in args.path or ()]
+    # The compilation depends on them, see `_client_environment`
+    environment = {"cwd": str(Path.cwd()), "env_path": os.environ.get("PATH", "")}
+    try:
+        if args.command == "codegen":
+            file_path, function = args.file_path, None
+            if args.codegen_command == "call_graph" and ":" in file_path:
+                file_path, function = file_path.rsplit(":", 1)
+            result = send_request(
+                socket_path,
+                args.codegen_command,
+                {
+                    "file_path": str(Path(file_path).resolve()),
+                    "function": function,
+                    "extra_paths": extra_paths,
+                    "engine": args.engine or read_pyproject_config()["compiler_engine"],
+                    **environment,
+                },
+            )
+            print(result["output"])
+            return 0
+
+        formatter = OutputFormatter(json_mode=args.json)
+        options = resolve_lint_options(args, formatter)
+        result = send_request(
+            socket_path,
+            "lint",
+            {
+                "files": [str(file.resolve()) for file in options.files],
+                "extra_paths": [str(path.resolve()) for path in options.extra_paths],
+                "engine": options.engine,
+                "rule_configs": options.rule_configs,
+                "select": sorted(options.select)
+                if options.select is not None
+                else None,
+                "disabled_rules": sorted(options.disabled_rules),
+                "min_severity": options.min_severity,
+                "include_source": not args.json,
+                **environment,
+            },
+        )
+    except RequestError as e:
+        print(f"Error: {e}")
+        return 1
+
+    for message in result["messages"]:
+        formatter.print(message)
+    issues = [issue_from_json(issue_dict) for issue_dict in result["issues"]]
+    formatter.print_issues(issues)
+    formatter.print_summary(bool(issues))
+    return 1 if issues else 0
@@ -0,0 +1,101 @@
+"""Detection of changed files by polling their modification times."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterable
+
+# (modification time, size) of a file, a change to either means the file changed
+_Signature = tuple[int, int]
+
+
+def is_temporary_copy(filename: str) -> bool:
+    """
+    Check if `filename` is a hidden copy of a module made by natrix to
+    compile unsaved contents (`.<module>.natrix-*`). Natrix used to write
+    them next to the module, left behind ones are not part of the project.
+    """
+    return filename.startswith(".") and ".natrix-" in filename
+
+
+class FileWatcher:
+    """
+    Detect the files created, modified or deleted between two polls.
+
+    Directories are watched for files with one of the given `suffixes`, other
+    paths (e.g. the imported modules of a project, wherever they are) are
+    watched individually. Changes are found by comparing the modification
+    times of the files, so no file system notification library is needed.
+    """
+
+    def __init__(
+        self,
+        roots: Iterable[Path],
+        suffixes: Collection[str],
+        files: Iterable[Path] = (),
+    ):
+        self.roots = [Path(root).resolve() for root in roots]
+        self.suffixes = tuple(suffixes)
+        self.files = {Path(file).resolve() for file in files}
+        self._signatures = self._scan()
+
+    def _scan(self) -> dict[Path, _Signature]:
+        signatures: dict[Path, _Signature] = {}
+
+        def add(path: Path) -> None:
+            signature = _signature(path)
+            # Deleted files are left out, they are reported as such
+            if signature is not None:
+                signatures[path] = signature
+
+        for root in self.roots:
+            if root.is_dir():
+                for dirpath, _, filenames in os.walk(root):
+                    for filename in filenames:
+                        if is_temporary_copy(filename):
+                            continue
+                        if filename.endswith(self.suffixes):
+                            add(Path(dirpath) / filename)
+            else:
+                add(root)
+
+        for file in self.files:
+            if file not in signatures:
+                add(file)
+
+        return signatures
+
+    def set_files(self, files: Iterable[Path]) -> None:
+        """
+        Replace the individually watched files. The files that weren't
+        watched yet are only reported once they change.
+        """
+        self.files = {Path(file).resolve() for file in files}
+        for file in self.files:
+            if file not in self._signatures:
+                signature = _signature(file)
+                if signature is not None:
+                    self._signatures[file] = signature
+
+    def poll(self) -> set[Path]:
+        """Return the files that changed since the previous poll."""
+        signatures = self._scan()
+        changed = {
+            path
+            for path in signatures.keys() | self._signatures.keys()
+            if signatures.get(path) != self._signatures.get(path)
+        }
+        self._signatures = signatures
+        return changed
+
+
+def _signature(path: Path) -> _Signature | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -1,3 +1,7 @@
+from pathlib import Path
+
+from natrix.context import ProjectContext
+from natrix.rules.common import RuleRegistry
 from natrix.rules.memory_expansion import MemoryExpansionRule
 from tests.conftest import run_rule_on_file
 
@@ -11,3 +15,21 @@ def test_fee_splitter_dispatch_fees(test_project_context):
     assert issues[0].position == "142:0"  # _set_receivers
     assert issues[1].position == "204:0"  # set_receivers
     assert all(issue.file.name == "FeeSplitter.vy" for issue in issues)
+
+
+def test_metadata_is_compiled_only_when_needed():
+    files = [Path("tests/contracts/fee_splitter/FeeSplitter.vy")]
+    file_path = files[0].resolve()
+
+    # Without NTX1 no enabled rule consumes metadata
+    outputs = RuleRegistry.get_required_outputs(disabled_rules={"NTX1"})
+    assert "metadata" not in outputs
+    assert "metadata" in RuleRegistry.get_required_outputs()
+
+    ctx = ProjectContext(files, outputs=outputs)
+    assert "metadata" not in ctx.get_module(file_path).compiler_output
+
+    # Running the rule anyway compiles the metadata on demand
+    issues = MemoryExpansionRule().run(ctx, file_path)
+    assert "metadata" in ctx.get_module(file_path).compiler_output
+    assert len(issues) == 2
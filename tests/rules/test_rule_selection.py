@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from natrix import OutputFormatter, lint_file
+from natrix.context import ProjectContext
+from natrix.rules.common import RuleRegistry
+from natrix.rules.memory_expansion import MemoryExpansionRule
+
+
+def test_select_only_instantiates_selected_rules(monkeypatch):
+    monkeypatch.setattr(RuleRegistry, "_rule_instances", None)
+
+    instantiated = []
+    original_init = MemoryExpansionRule.__init__
+
+    def tracking_init(self, *args, **kwargs):
+        instantiated.append(self.CODE)
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(MemoryExpansionRule, "__init__", tracking_init)
+
+    rules = RuleRegistry.get_rules(select={"NTX2", "NTX8"})
+
+    assert sorted(rule.code for rule in rules) == ["NTX2", "NTX8"]
+    assert instantiated == []
+
+
+def test_disabled_rules_take_precedence_over_select():
+    selected = RuleRegistry.select_rule_classes(
+        select={"NTX1", "NTX2"}, disabled_rules={"NTX1"}
+    )
+
+    assert [rule_class.CODE for rule_class in selected.values()] == ["NTX2"]
+
+
+def test_min_severity():
+    selected = RuleRegistry.select_rule_classes(min_severity="warning")
+
+    assert selected
+    assert {rule_class.SEVERITY for rule_class in selected.values()} == {
+        "warning",
+        "important",
+    }
+    # Metadata is only needed if the selection includes NTX1
+    assert "metadata" in RuleRegistry.get_required_outputs(min_severity="warning")
+    assert "metadata" not in RuleRegistry.get_required_outputs(select={"NTX2"})
+
+
+def test_disabled_rules_never_run(monkeypatch):
+    monkeypatch.setattr(RuleRegistry, "_rule_instances", None)
+    # NTX1 is instantiated, then disabled
+    RuleRegistry.get_rules()
+    outputs = RuleRegistry.get_required_outputs(disabled_rules={"NTX1"})
+
+    file_path = Path("tests/contracts/fee_splitter/FeeSplitter.vy").resolve()
+    ctx = ProjectContext([file_path], outputs=outputs)
+    lint_file(file_path, ctx, OutputFormatter(), {"NTX1"})
+
+    # Running NTX1 would have compiled the metadata on demand
+    assert "metadata" not in ctx.get_module(file_path).compiler_output
@@ -0,0 +1,66 @@
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+from natrix import OutputFormatter, lint_files
+from natrix.rules.common import RuleRegistry, run_rules
+from natrix.rules.unused_event import UnusedEventRule
+from natrix.rules.unused_variable import UnusedVariableRule
+
+
+def _rules():
+    RuleRegistry.discover_rules()
+    return [rule_class() for rule_class in RuleRegistry.get_rule_classes().values()]
+
+
+def test_single_pass_matches_separate_runs(test_project_context):
+    for file_path in (
+        Path("tests/contracts/Twocrypto.vy"),
+        Path("tests/contracts/test_unused_event.vy"),
+    ):
+        file_path = file_path.resolve()
+        expected = []
+        for rule in _rules():
+            expected.extend(rule.run(test_project_context, file_path))
+
+        issues = run_rules(_rules(), test_project_context, file_path)
+
+        assert issues == expected
+
+
+def test_failing_rule_does_not_affect_the_others(test_project_context, monkeypatch):
+    file_path = Path("tests/contracts/test_unused_event.vy").resolve()
+
+    def broken(*_args):
+        raise RuntimeError("boom")
+
+    # before_traversal and visit_* failures are both isolated
+    monkeypatch.setattr(UnusedVariableRule, "visit_FunctionDef", broken)
+    monkeypatch.setattr(UnusedEventRule, "before_traversal", broken)
+
+    errors = []
+    issues = run_rules(
+        _rules(),
+        test_project_context,
+        file_path,
+        on_error=lambda rule, e: errors.append((rule.code, str(e))),
+    )
+
+    assert sorted(errors) == [("NTX13", "boom"), ("NTX8", "boom")]
+    assert issues
+    assert not any(issue.code in ("NTX8", "NTX13") for issue in issues)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="parallel linting relies on fork",
+)
+def test_parallel_lint_matches_serial(test_project_context):
+    file_paths = sorted(Path("tests/contracts").resolve().rglob("*.vy"))
+
+    serial = lint_files(file_paths, test_project_context, OutputFormatter(), jobs=1)
+    parallel = lint_files(file_paths, test_project_context, OutputFormatter(), jobs=3)
+
+    assert serial
+    assert parallel == serial
@@ -0,0 +1,205 @@
+"""Tests for the AST node wrappers."""
+
+from pathlib import Path
+
+import pytest
+
+from natrix.ast_node import FunctionDefNode, ModuleNode, Node, field_getter
+from natrix.ast_tools import parse_file
+
+
+@pytest.fixture(scope="module")
+def twocrypto():
+    compiler_output = parse_file(
+        Path("tests/contracts/Twocrypto.vy").resolve(), outputs=("ast",)
+    )
+    return Node.from_dict(compiler_output["ast"])
+
+
+def test_nodes_use_slots(twocrypto):
+    name = twocrypto.get_descendants("Name")[0]
+
+    assert type(name) is Node
+    assert not hasattr(name, "__dict__")
+    assert name.ast_type == "Name"
+    assert name.module_node is twocrypto
+
+
+def test_immutable_vars_are_shared_by_the_module(twocrypto):
+    name = twocrypto.get_descendants("Name")[0]
+
+    assert name.immutable_vars == twocrypto.immutable_vars
+    assert name.immutable_vars is twocrypto.immutable_vars
+
+
+def test_specialized_nodes(twocrypto):
+    assert isinstance(twocrypto, ModuleNode)
+    assert all(isinstance(func, FunctionDefNode) for func in twocrypto.functions)
+    exchange = next(f for f in twocrypto.functions if f.get("name") == "exchange")
+    assert exchange.is_external
+    assert exchange.called_functions
+
+
+def _preorder(node):
+    yield node
+    for child in node.children:
+        yield from _preorder(child)
+
+
+def test_type_index_matches_linear_scan(twocrypto):
+    node_types = ("Name", "Call", ("For", "Call"), "FunctionDef")
+    for root in (twocrypto, *twocrypto.functions):
+        descendants = list(_preorder(root))[1:]
+        for node_type in node_types:
+            types = (node_type,) if isinstance(node_type, str) else node_type
+            expected = [n for n in descendants if n.ast_type in types]
+            assert root.get_descendants(node_type) == expected
+
+
+def test_type_index_include_self_and_reverse(twocrypto):
+    function = twocrypto.functions[0]
+
+    assert function.get_descendants("FunctionDef") == []
+    assert function.get_descendants("FunctionDef", include_self=True) == [function]
+    names = function.get_descendants("Name")
+    assert function.get_descendants("Name", reverse=True) == names[::-1]
+
+
+def test_descendants_are_preorder_slices(twocrypto):
+    for root in (twocrypto, *twocrypto.functions):
+        expected = list(_preorder(root))
+        assert root.get_descendants(include_self=True) == expected
+        # include_self is honored regardless of previous calls
+        assert root.get_descendants() == expected[1:]
+
+
+def test_ancestry(twocrypto):
+    function = twocrypto.functions[0]
+    name = function.get_descendants("Name")[-1]
+
+    assert function.is_ancestor_of(name)
+    assert twocrypto.is_ancestor_of(name)
+    assert not name.is_ancestor_of(function)
+    assert not function.is_ancestor_of(function)
+    assert not twocrypto.functions[1].is_ancestor_of(name)
+    assert name.get_ancestor("FunctionDef") is function
+    assert name.get_ancestor(("Module", "FunctionDef")) is function
+
+
+def test_lazy_tree_matches_eager_tree(twocrypto):
+    lazy = Node.from_dict(twocrypto.node_dict, lazy=True)
+
+    assert lazy.index.nodes.count(None) == len(lazy.index.nodes) - 1
+    # Querying wraps the matches and their ancestors only
+    names = lazy.get_descendants("Name")
+    assert None in lazy.index.nodes
+    assert [n.node_dict for n in names] == [
+        n.node_dict for n in twocrypto.get_descendants("Name")
+    ]
+    function = lazy.get_descendants("FunctionDef")[0]
+    assert isinstance(function, FunctionDefNode)
+    assert function.get_descendants("Name")[0].get_ancestor("FunctionDef") is function
+
+    lazy_nodes = lazy.get_descendants(include_self=True)
+    eager_nodes = twocrypto.get_descendants(include_self=True)
+    assert [(n.node_dict, n.enter, n.exit) for n in lazy_nodes] == [
+        (n.node_dict, n.enter, n.exit) for n in eager_nodes
+    ]
+    assert all(
+        node.parent is None or node in node.parent.children for node in lazy_nodes
+    )
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_deeply_nested_tree(lazy):
+    node_dict = {"ast_type": "Name", "id": "x"}
+    for _ in range(5000):
+        node_dict = {"ast_type": "UnaryOp", "operand": node_dict}
+
+    root = Node.from_dict(node_dict, lazy=lazy)
+
+    name = root.get_descendants("Name")[0]
+    assert name.module_node is root
+    assert len(root.get_descendants()) == 5000
+
+
+@pytest.mark.parametrize("path", ["ast_type", "target.id", "func.value.id", "a.b.c.d"])
+def test_field_getter_matches_get(twocrypto, path):
+    getter = field_getter(path)
+    assert field_getter(path) is getter
+
+    for node in twocrypto.get_descendants():
+        assert getter(node.node_dict) == node.get(path)
+        assert getter(node.node_dict, "missing") == node.get(path, "missing")
+
+
+def test_field_getter_stops_at_non_dicts():
+    node_dict = {"ast_type": "Name", "id": "x", "value": None, "targets": [{}]}
+
+    assert field_getter("id.upper")(node_dict, 0) == 0
+    assert field_getter("value.id")(node_dict, 0) == 0
+    assert field_getter("targets.0")(node_dict) is None
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_get_node_by_id(twocrypto, lazy):
+    root = Node.from_dict(twocrypto.node_dict, lazy=lazy)
+
+    assert root.get_node_by_id(-1) is None
+    for node in root.get_descendants(node_type=("Name", "FunctionDef")):
+        assert root.get_node_by_id(node.node_id) is node
+
+    # Resolve a variable read back to its declaration
+    name = next(
+        name
+        for name in root.get_descendants(node_type="Name")
+        if name.get("variable_reads")
+    )
+    decl_ref = name.get("variable_reads")[0]["decl_node"]
+    declaration = name.get_node_by_id(decl_ref["node_id"], decl_ref["source_id"])
+    assert declaration is not None
+    assert declaration.node_id == decl_ref["node_id"]
+
+    # Node ids are only unique within a source file
+    assert name.get_node_by_id(decl_ref["node_id"], -1) is None
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("node_type", [None, "Name", ("For", "Name", "Assign")])
+@pytest.mark.parametrize("include_self", [False, True])
+@pytest.mark.parametrize("reverse", [False, True])
+def test_iter_descendants_matches_get_descendants(
+    twocrypto, lazy, node_type, include_self, reverse
+):
+    root = Node.from_dict(twocrypto.node_dict, lazy=lazy)
+    function = root.get_descendants("FunctionDef")[3]
+
+    for node in (root, function):
+        expected = node.get_descendants(
+            node_type, include_self=include_self, reverse=reverse
+        )
+        streamed = node.iter_descendants(
+            node_type, include_self=include_self, reverse=reverse
+        )
+        assert list(streamed) == expected
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_iter_descendants_outside_an_index(twocrypto, reverse):
+    function_dict = twocrypto.get_descendants("FunctionDef")[3].node_dict
+    # Only roots are indexed
+    function = Node(function_dict, parent=twocrypto)
+    assert function.index is None
+
+    expected = [node.node_dict for node in _preorder(function)]
+    if reverse:
+        expected.reverse()
+    streamed = function.iter_descendants(include_self=True, reverse=reverse)
+    assert [node.node_dict for node in streamed] == expected
+
+
+def test_has_descendant(twocrypto):
+    assert twocrypto.has_descendant("FunctionDef")
+    assert not twocrypto.has_descendant("NoSuchNode")
+    assert twocrypto.has_descendant("FunctionDef", filters={"name": "__init__"})
+    assert not twocrypto.has_descendant("FunctionDef", filters={"name": "missing"})
@@ -1,15 +1,27 @@
 import os
 import re
 import subprocess
+import threading
+import time
 from pathlib import Path
 
+import pytest
+
+from natrix import ast_tools
+from natrix.ast_node import Node
 from natrix.ast_tools import (
     SUPPORTED_VYPER_VERSION_PATTERN,
+    CompilationCancelledError,
+    MultiVisitor,
+    VyperASTVisitor,
     _parse_comments,
+    get_toolchain,
     parse_file,
     parse_source,
     vyper_compile,
+    vyper_compile_formats,
 )
+from natrix.cache import CompileCache
 
 
 def test_vyper_compile_integration():
@@ -142,3 +154,168 @@ def test_comment_parser_all_contracts():
             assert isinstance(comment["end_lineno"], int)
             assert isinstance(comment["end_col_offset"], int)
             assert isinstance(comment["content"], str)
+
+
+def test_inprocess_engine_matches_subprocess():
+    # The in-process engine must return exactly what the vyper executable prints
+    test_files = [
+        Path("tests/contracts/version_dummy.vy"),
+        Path("tests/contracts/fee_splitter/FeeSplitter.vy"),
+        Path("tests/contracts/fee_splitter/interfaces/IController.vyi"),
+    ]
+
+    for test_file in test_files:
+        for formatting in ("annotated_ast", "abi"):
+            assert vyper_compile(
+                test_file, formatting, engine="inprocess"
+            ) == vyper_compile(test_file, formatting)
+
+    assert parse_file(test_files[1], engine="inprocess") == parse_file(test_files[1])
+
+
+def test_inprocess_engine_reports_compiler_errors(tmp_path):
+    # Deferred initialization can't produce metadata, parse_file should still
+    # recognize the compiler exception when compiling in-process.
+    (tmp_path / "ownable.vy").write_text(Path("tests/contracts/ownable.vy").read_text())
+    user = tmp_path / "user.vy"
+    user.write_text(
+        "import ownable\nuses: ownable\n\n"
+        "@external\n@view\ndef f() -> address:\n    return ownable.owner\n"
+    )
+
+    with pytest.raises(Exception, match="InitializerException"):
+        vyper_compile(user, "metadata", engine="inprocess")
+
+    result = parse_file(user, engine="inprocess")
+    assert "ast" in result
+    assert "metadata" not in result
+
+
+def test_toolchain_is_probed_once(monkeypatch, tmp_path):
+    # The environment is probed once per process, and persisted in the
+    # cache directory so that later processes don't probe it at all.
+    monkeypatch.setattr(ast_tools, "_toolchains", {})
+    probes = []
+    original_obtain_sys_path = ast_tools._obtain_sys_path
+
+    def counting_obtain_sys_path():
+        probes.append(1)
+        return original_obtain_sys_path()
+
+    monkeypatch.setattr(ast_tools, "_obtain_sys_path", counting_obtain_sys_path)
+    cache = CompileCache(tmp_path / "cache")
+
+    toolchain = get_toolchain(cache=cache)
+    assert get_toolchain(cache=cache) is toolchain
+    assert len(probes) == 1
+    assert SUPPORTED_VYPER_VERSION_PATTERN.match(toolchain.compiler_version)
+    assert all(p.exists() for p in toolchain.search_paths)
+
+    # Simulate a new process
+    monkeypatch.setattr(ast_tools, "_toolchains", {})
+    assert get_toolchain(cache=CompileCache(tmp_path / "cache")) == toolchain
+    assert len(probes) == 1
+
+
+def test_vyper_compile_formats_matches_separate_compilations():
+    test_file = Path("tests/contracts/version_dummy.vy")
+    formats = ("annotated_ast", "metadata", "abi")
+
+    outputs = vyper_compile_formats(test_file, formats)
+
+    assert list(outputs) == list(formats)
+    for formatting in formats:
+        assert outputs[formatting] == vyper_compile(test_file, formatting)
+
+
+def test_parse_file_compiles_unsaved_source(tmp_path):
+    (tmp_path / "lib.vy").write_text("X: constant(uint256) = 3\n")
+    file_path = (tmp_path / "main.vy").resolve()
+    file_path.write_text("# pragma version >=0.4.0\n")
+    source_code = (
+        "from . import lib\n\n@external\n@pure\ndef f() -> uint256:\n    return lib.X\n"
+    )
+
+    result = parse_file(file_path, source_code=source_code)
+
+    # The output refers to the file, the relative import resolved next to it
+    assert result["ast"]["resolved_path"] == str(file_path)
+    assert [Path(i["resolved_path"]) for i in result["imports"]] == [
+        (tmp_path / "lib.vy").resolve()
+    ]
+    assert [f["name"] for f in result["abi"]] == ["f"]
+    # The shadow copy compiled in place of the file is gone
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["lib.vy", "main.vy"]
+
+    with pytest.raises(Exception, match=r"main\.vy") as exc_info:
+        parse_file(file_path, source_code="def f(\n")
+    assert ".natrix-" not in str(exc_info.value)
+
+
+def test_unsaved_source_without_inprocess_compiler(tmp_path, monkeypatch):
+    # The executable compiles a copy outside of the project
+    monkeypatch.setattr(ast_tools, "_inprocess_vyper_version", lambda: None)
+    (tmp_path / "lib.vy").write_text("X: constant(uint256) = 3\n")
+    file_path = (tmp_path / "main.vy").resolve()
+    file_path.write_text("# pragma version >=0.4.0\n")
+    source_code = (
+        "import lib\n\n@external\n@pure\ndef f() -> uint256:\n    return lib.X\n"
+    )
+
+    result = parse_file(file_path, source_code=source_code, outputs=("ast",))
+
+    # The directory of the file is searched for imports
+    assert result["ast"]["resolved_path"] == str(file_path)
+    assert [Path(i["resolved_path"]) for i in result["imports"]] == [
+        (tmp_path / "lib.vy").resolve()
+    ]
+    with pytest.raises(Exception, match=str(file_path)):
+        parse_file(file_path, source_code="def f(\n")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["lib.vy", "main.vy"]
+
+
+def test_compilation_can_be_cancelled():
+    test_file = Path("tests/contracts/Twocrypto.vy")
+    cancel = threading.Event()
+    timer = threading.Timer(0.1, cancel.set)
+    timer.start()
+
+    start = time.monotonic()
+    with pytest.raises(CompilationCancelledError):
+        vyper_compile_formats(test_file, ("annotated_ast",), cancel=cancel)
+    # The compiler was killed rather than waited for
+    assert time.monotonic() - start < 1
+    timer.join()
+
+    with pytest.raises(CompilationCancelledError):
+        parse_file(test_file, engine="inprocess", cancel=cancel)
+
+
+class _DeclarationRecorder(VyperASTVisitor):
+    def __init__(self):
+        self.visited = []
+
+    def visit_FunctionDef(self, node):  # noqa: N802
+        self.visited.append(node.node_dict)
+
+    def visit_Name(self, node):  # noqa: N802
+        self.visited.append(node.node_dict)
+
+
+def test_visitor_skips_subtrees_without_handled_types():
+    compiler_output = parse_file(
+        Path("tests/contracts/Twocrypto.vy").resolve(), outputs=("ast",)
+    )
+    tree = Node.from_dict(compiler_output["ast"], lazy=True)
+
+    indexed = _DeclarationRecorder()
+    MultiVisitor([indexed]).visit(tree)
+
+    # A subtree outside of the indexed tree is walked node by node
+    unindexed = _DeclarationRecorder()
+    MultiVisitor([unindexed]).visit(Node(tree.node_dict, parent=tree))
+
+    assert indexed.visited
+    assert indexed.visited == unindexed.visited
+    # Only the visited nodes and their ancestors were wrapped
+    assert None in tree.index.nodes
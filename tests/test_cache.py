@@ -0,0 +1,137 @@
+"""Tests for the on-disk compiler output cache."""
+
+from pathlib import Path
+
+import pytest
+
+from natrix import ast_tools
+from natrix.ast_tools import parse_file, vyper_compile
+from natrix.cache import CompileCache
+
+PROVIDER_SOURCE = """
+# pragma version >=0.4.0
+
+VALUE: constant(uint256) = 1
+"""
+
+IMPORTER_SOURCE = """
+# pragma version >=0.4.0
+
+import provider
+
+@external
+@view
+def value() -> uint256:
+    return provider.VALUE
+"""
+
+
+@pytest.fixture
+def compiler_invocations(monkeypatch):
+    """Record the formats of every compiler process started."""
+    invocations = []
+    original_compile_subprocess = ast_tools._compile_subprocess
+
+    def counting_compile_subprocess(filename, formats, path_flags, cancel=None):
+        invocations.append(formats)
+        return original_compile_subprocess(filename, formats, path_flags, cancel)
+
+    monkeypatch.setattr(ast_tools, "_compile_subprocess", counting_compile_subprocess)
+    return invocations
+
+
+def _write_project(tmp_path: Path) -> Path:
+    (tmp_path / "provider.vy").write_text(PROVIDER_SOURCE)
+    importer = tmp_path / "importer.vy"
+    importer.write_text(IMPORTER_SOURCE)
+    return importer
+
+
+def test_warm_compile_is_a_hit(tmp_path):
+    """Compiling the same file twice should only invoke the compiler once."""
+    importer = _write_project(tmp_path)
+    cache = CompileCache(tmp_path / "cache")
+
+    cold = vyper_compile(importer, "annotated_ast", cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    warm = vyper_compile(importer, "annotated_ast", cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert warm == cold
+
+
+def test_parse_file_with_cache_matches_uncached(tmp_path):
+    importer = _write_project(tmp_path)
+    cache = CompileCache(tmp_path / "cache")
+
+    parse_file(importer, cache=cache)
+    cached = parse_file(importer, cache=cache)
+
+    assert cached == parse_file(importer)
+    # annotated_ast, metadata and abi
+    assert cache.hits == 3
+
+
+def test_source_change_invalidates_entry(tmp_path):
+    importer = _write_project(tmp_path)
+    cache = CompileCache(tmp_path / "cache")
+
+    vyper_compile(importer, "annotated_ast", cache=cache)
+    importer.write_text(IMPORTER_SOURCE + "\n# edited\n")
+    vyper_compile(importer, "annotated_ast", cache=cache)
+
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_import_change_invalidates_entry(tmp_path):
+    """Editing an imported module must invalidate the importer's entry."""
+    importer = _write_project(tmp_path)
+    cache = CompileCache(tmp_path / "cache")
+
+    vyper_compile(importer, "metadata", cache=cache)
+    (tmp_path / "provider.vy").write_text(PROVIDER_SOURCE.replace("= 1", "= 2"))
+    vyper_compile(importer, "metadata", cache=cache)
+
+    assert cache.hits == 0
+
+
+def test_lint_and_codegen_share_one_compilation(tmp_path, compiler_invocations):
+    """parse_file compiles every format at once, codegen reuses its ABI."""
+    importer = _write_project(tmp_path)
+    cache = CompileCache(tmp_path / "cache")
+
+    result = parse_file(importer, cache=cache)
+    abi = vyper_compile(importer, "abi", cache=cache)
+
+    assert compiler_invocations == [["annotated_ast", "metadata", "abi"]]
+    assert abi == result["abi"]
+
+
+def test_deferred_initialization_failure_is_cached(tmp_path, compiler_invocations):
+    """Warm runs don't retry a metadata compilation known to fail."""
+    (tmp_path / "ownable.vy").write_text(Path("tests/contracts/ownable.vy").read_text())
+    user = tmp_path / "user.vy"
+    user.write_text(
+        "import ownable\nuses: ownable\n\n"
+        "@external\n@view\ndef f() -> address:\n    return ownable.owner\n"
+    )
+    cache = CompileCache(tmp_path / "cache")
+    cold = parse_file(user, cache=cache)
+    assert "metadata" not in cold
+    # The metadata fails, the AST is compiled on its own
+    assert compiler_invocations == [
+        ["annotated_ast", "metadata", "abi"],
+        ["annotated_ast"],
+    ]
+    compiler_invocations.clear()
+
+    assert parse_file(user, cache=cache) == cold
+    assert compiler_invocations == []
+
+    # Initializing the module makes the metadata compile again
+    user.write_text(
+        "import ownable\ninitializes: ownable\n\n"
+        "@deploy\ndef __init__():\n    ownable.__init__()\n"
+    )
+    assert "metadata" in parse_file(user, cache=cache)
+    assert compiler_invocations == [["annotated_ast", "metadata", "abi"]]
@@ -0,0 +1,57 @@
+"""Tests for the array-backed AST."""
+
+from pathlib import Path
+
+import pytest
+
+from natrix.context import ProjectContext
+
+np = pytest.importorskip("numpy")
+
+from natrix.columnar import MISSING  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def twocrypto():
+    file_path = Path("tests/contracts/Twocrypto.vy")
+    ctx = ProjectContext([file_path], outputs=["ast"])
+    return ctx.get_module(file_path.resolve())
+
+
+def test_columns_match_nodes(twocrypto):
+    columnar = twocrypto.columnar_ast
+    nodes = twocrypto.ast_node.get_descendants(include_self=True)
+
+    assert len(columnar) == len(nodes)
+    for position, node in enumerate(nodes):
+        assert columnar.node(position) is node
+        assert columnar.type_names[columnar.type_code[position]] == node.ast_type
+        assert columnar.exit[position] == node.exit
+        assert columnar.lineno[position] == node.get("lineno", MISSING)
+        if node.parent is None:
+            assert columnar.parent[position] == MISSING
+        else:
+            assert columnar.parent[position] == node.parent.enter
+
+    calls = twocrypto.ast_node.get_descendants("Call")
+    assert [columnar.node(p) for p in columnar.positions_of("Call")] == calls
+
+
+def test_per_function_queries_match_node_api(twocrypto):
+    columnar = twocrypto.columnar_ast
+    names = columnar.names_by_function()
+    accesses = columnar.accesses_by_function()
+
+    for function in twocrypto.ast_node.functions:
+        expected_names = {n.get("id") for n in function.get_descendants("Name")}
+        assert names.get(function.enter, set()) == expected_names
+
+        expected_accesses: dict[str, tuple[int, int]] = {}
+        for access in function.memory_accesses:
+            reads, writes = expected_accesses.get(access.var, (0, 0))
+            if access.type == "read":
+                reads += 1
+            else:
+                writes += 1
+            expected_accesses[access.var] = (reads, writes)
+        assert accesses.get(function.enter, {}) == expected_accesses
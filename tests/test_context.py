@@ -2,6 +2,8 @@
 
 from pathlib import Path
 
+import pytest
+
 from natrix.context import ProjectContext
 
 
@@ -107,3 +109,140 @@ def test_path_normalization_consistency():
     assert set(ctx1.modules.keys()) == set(ctx2.modules.keys()), (
         "Different path formats should result in same module keys"
     )
+
+
+def test_concurrent_build_matches_serial():
+    """Test that compiling with several jobs yields the same dependency graph."""
+    contracts_dir = Path("tests/contracts")
+    files = list(contracts_dir.rglob("*.vy")) + list(contracts_dir.rglob("*.vyi"))
+
+    serial = ProjectContext(files)
+    concurrent = ProjectContext(files, jobs=4)
+
+    assert set(serial.modules) == set(concurrent.modules)
+    for path, module in serial.modules.items():
+        assert concurrent.modules[path].dependencies == module.dependencies
+        assert concurrent.modules[path].dependents == module.dependents
+        assert concurrent.modules[path].compiler_output == module.compiler_output
+
+
+def test_dependencies_are_compiled_on_demand():
+    """Test that modules only reached through imports skip metadata until asked."""
+    files = [Path("tests/contracts/fee_splitter/FeeSplitter.vy")]
+    ctx = ProjectContext(files)
+
+    fee_splitter = ctx.get_module(files[0].resolve())
+    assert "metadata" in fee_splitter.compiler_output
+    assert "comments" in fee_splitter.compiler_output
+
+    controller_path = Path(
+        "tests/contracts/fee_splitter/ControllerMulticlaim.vy"
+    ).resolve()
+    controller = ctx.get_module(controller_path)
+    assert controller.outputs == {"ast"}
+    assert "metadata" not in controller.compiler_output
+    assert "comments" not in controller.compiler_output
+
+    assert ctx.ensure_outputs(controller_path, ["metadata"]) is controller
+    assert "metadata" in controller.compiler_output
+    assert controller.outputs == {"ast", "metadata"}
+
+
+def test_compiler_output_node_is_shared_and_lazy():
+    """Test that rules share one view of the compiler output, built on demand."""
+    files = [Path("tests/contracts/fee_splitter/FeeSplitter.vy")]
+    ctx = ProjectContext(files, outputs=["ast"])
+
+    module = ctx.get_module(files[0].resolve())
+    assert "compiler_output_node" not in vars(module)
+
+    view = module.compiler_output_node
+    assert module.compiler_output_node is view
+    assert view.get("metadata.function_info") is None
+
+    # Parts compiled later are visible through the existing view
+    ctx.ensure_outputs(module.path, ["metadata"])
+    assert view.get("metadata.function_info")
+
+
+def _write_chain(tmp_path: Path) -> dict[str, Path]:
+    """main imports middle, which imports leaf. standalone imports nothing."""
+    sources = {
+        "leaf": "VALUE: constant(uint256) = 1\n",
+        "middle": "import leaf\n\nDOUBLE: constant(uint256) = leaf.VALUE * 2\n",
+        "main": (
+            "import middle\n\n"
+            "@external\n@view\ndef value() -> uint256:\n    return middle.DOUBLE\n"
+        ),
+        "standalone": "@external\n@pure\ndef one() -> uint256:\n    return 1\n",
+    }
+    paths = {}
+    for name, source in sources.items():
+        paths[name] = (tmp_path / f"{name}.vy").resolve()
+        paths[name].write_text("# pragma version >=0.4.0\n\n" + source)
+    return paths
+
+
+def test_update_recompiles_changed_modules_and_their_dependents(tmp_path):
+    paths = _write_chain(tmp_path)
+    ctx = ProjectContext([paths["main"], paths["standalone"]])
+    assert set(ctx.modules) == set(paths.values())
+    standalone = ctx.modules[paths["standalone"]]
+
+    paths["leaf"].write_text(paths["leaf"].read_text().replace("= 1", "= 2"))
+    assert ctx.update([paths["leaf"]]) == [paths["main"]]
+    # Untouched modules are kept as they are
+    assert ctx.modules[paths["standalone"]] is standalone
+    # The compiler lists indirect imports as well
+    assert ctx.get_dependents_of(paths["leaf"]) == {paths["middle"], paths["main"]}
+
+    # An added file becomes a file to lint
+    added = (tmp_path / "added.vy").resolve()
+    added.write_text("# pragma version >=0.4.0\n\nimport leaf\n")
+    assert ctx.update([added]) == [added]
+    assert ctx.initial_files[-1] == added
+    assert ctx.get_dependents_of(paths["leaf"]) == {
+        paths["middle"],
+        paths["main"],
+        added,
+    }
+
+    # Modules no longer imported are dropped along with deleted files
+    paths["main"].write_text("# pragma version >=0.4.0\n")
+    added.unlink()
+    assert ctx.update([paths["main"], added]) == [paths["main"]]
+    assert set(ctx.modules) == {paths["main"], paths["standalone"]}
+    assert ctx.initial_files == [paths["main"], paths["standalone"]]
+
+
+def test_failed_update_leaves_the_project_untouched(tmp_path):
+    paths = _write_chain(tmp_path)
+    ctx = ProjectContext([paths["main"]])
+    modules = dict(ctx.modules)
+
+    paths["leaf"].write_text("VALUE: constant(uint256) = \n")
+    with pytest.raises(Exception, match="leaf"):
+        ctx.update([paths["leaf"]])
+
+    assert ctx.modules == modules
+
+
+def test_update_module_compiles_unsaved_source(tmp_path):
+    paths = _write_chain(tmp_path)
+    ctx = ProjectContext([paths["main"]])
+    middle = ctx.modules[paths["middle"]]
+
+    unsaved = "# pragma version >=0.4.0\n\nimport standalone\n"
+    module_info = ctx.update_module(paths["main"], unsaved, outputs=("ast",))
+
+    assert module_info.outputs == {"ast"}
+    assert module_info.dependencies == {paths["standalone"]}
+    assert set(ctx.modules) == {paths["main"], paths["standalone"]}
+
+    # An imported module becomes a file to lint, compiled from disk
+    ctx = ProjectContext([paths["main"]])
+    ctx.update_module(paths["middle"])
+    assert ctx.initial_files == [paths["main"], paths["middle"]]
+    assert ctx.modules[paths["middle"]] is not middle
+    assert "metadata" in ctx.modules[paths["middle"]].compiler_output
+    assert ctx.get_dependents_of(paths["middle"]) == {paths["main"]}
@@ -0,0 +1,44 @@
+"""Tests for the compact loading of compiler outputs."""
+
+import json
+from pathlib import Path
+
+from natrix import interning
+from natrix.ast_tools import vyper_compile_formats
+
+
+def _twocrypto_ast_text():
+    compiled = vyper_compile_formats(
+        Path("tests/contracts/Twocrypto.vy").resolve(), ("annotated_ast",)
+    )
+    return json.dumps(compiled["annotated_ast"])
+
+
+def test_compact_loading_matches_json():
+    text = _twocrypto_ast_text()
+    assert interning.loads(text) == json.loads(text)
+
+
+def test_repeated_names_and_annotations_are_shared():
+    ast = interning.loads(_twocrypto_ast_text())["ast"]
+
+    names = {}
+    types = {}
+    stack = [ast]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(obj)
+            continue
+        if not isinstance(obj, dict):
+            continue
+        if obj.get("ast_type") == "Name":
+            names.setdefault(obj["id"], set()).add(id(obj["id"]))
+        if isinstance(obj.get("type"), dict):
+            types.setdefault(repr(obj["type"]), set()).add(id(obj["type"]))
+        stack.extend(obj.values())
+
+    assert names
+    assert types
+    assert all(len(ids) == 1 for ids in names.values())
+    assert all(len(ids) == 1 for ids in types.values())
@@ -0,0 +1,185 @@
+"""Tests for the language server."""
+
+import io
+import queue
+
+import pytest
+
+from natrix import ast_tools, find_vy_files
+from natrix.lsp import LanguageServer, read_message, serve_lsp, write_message
+from natrix.watch import FileWatcher
+
+SOURCE = """# pragma version >=0.4.0
+
+@external
+@pure
+def value() -> uint256:
+    unused: uint256 = 1
+    return 2
+"""
+
+
+def notification(method, params):
+    return {"jsonrpc": "2.0", "method": method, "params": params}
+
+
+class Editor:
+    """Collect the messages of a language server."""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.server = LanguageServer(self.messages.put, debounce=0)
+
+    def request(self, method, params=None):
+        self.server.handle_message(
+            {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+        )
+        return self.messages.get(timeout=30)
+
+    def diagnostics(self):
+        """Wait for the next diagnostics published."""
+        while True:
+            message = self.messages.get(timeout=60)
+            if message.get("method") == "textDocument/publishDiagnostics":
+                return message["params"]
+
+
+def test_diagnostics_follow_unsaved_edits(tmp_path):
+    file_path = tmp_path / "main.vy"
+    file_path.write_text(SOURCE)
+    uri = file_path.resolve().as_uri()
+    editor = Editor()
+    try:
+        capabilities = editor.request("initialize")["result"]["capabilities"]
+        assert capabilities["textDocumentSync"]["change"] == 1
+
+        editor.server.handle_message(
+            notification(
+                "textDocument/didOpen",
+                {"textDocument": {"uri": uri, "version": 1, "text": SOURCE}},
+            )
+        )
+        params = editor.diagnostics()
+        assert params["uri"] == uri
+        assert params["version"] == 1
+        [diagnostic] = params["diagnostics"]
+        assert diagnostic["code"] == "NTX8"
+        # Issue positions have 1-based lines, LSP positions 0-based ones
+        assert diagnostic["range"]["start"] == {"line": 5, "character": 4}
+
+        def edit(version, text):
+            editor.server.handle_message(
+                notification(
+                    "textDocument/didChange",
+                    {
+                        "textDocument": {"uri": uri, "version": version},
+                        "contentChanges": [{"text": text}],
+                    },
+                )
+            )
+
+        # The buffer is linted, not the file on disk
+        edit(2, SOURCE.replace("    unused: uint256 = 1\n", ""))
+        params = editor.diagnostics()
+        assert (params["version"], params["diagnostics"]) == (2, [])
+
+        # Compilation errors are reported at their position
+        edit(3, SOURCE.replace("return 2", "return self.missing"))
+        params = editor.diagnostics()
+        [diagnostic] = params["diagnostics"]
+        assert "missing" in diagnostic["message"]
+        assert diagnostic["range"]["start"] == {"line": 6, "character": 11}
+
+        editor.server.handle_message(
+            notification("textDocument/didClose", {"textDocument": {"uri": uri}})
+        )
+        assert editor.diagnostics() == {"uri": uri, "diagnostics": []}
+
+        assert editor.request("shutdown")["result"] is None
+    finally:
+        editor.server.stop()
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_unsaved_contents_are_never_written_to_the_project(
+    tmp_path, monkeypatch, in_memory
+):
+    file_path = tmp_path / "main.vy"
+    file_path.write_text(SOURCE)
+    # Left behind next to the module by a previous version
+    (tmp_path / ".main.natrix-1-2.vy").write_text(SOURCE)
+    uri = file_path.resolve().as_uri()
+    if not in_memory:
+        # vyper can't be imported, the executable compiles a copy
+        monkeypatch.setattr(ast_tools, "_inprocess_vyper_version", lambda: None)
+
+    # A lint or watch run started while an edit is compiled
+    watcher = FileWatcher([tmp_path], (".vy",))
+    seen = []
+
+    def observe(name):
+        compile_function = getattr(ast_tools, name)
+
+        def observed(*args, **kwargs):
+            seen.append(
+                (
+                    name,
+                    sorted(p.name for p in tmp_path.iterdir()),
+                    find_vy_files(tmp_path),
+                    watcher.poll(),
+                )
+            )
+            return compile_function(*args, **kwargs)
+
+        return observed
+
+    for name in ("_compile_inprocess", "_compile_subprocess"):
+        monkeypatch.setattr(ast_tools, name, observe(name))
+
+    editor = Editor()
+    try:
+        editor.request("initialize")
+        editor.server.handle_message(
+            notification(
+                "textDocument/didOpen",
+                {"textDocument": {"uri": uri, "version": 1, "text": SOURCE + "\n"}},
+            )
+        )
+        [diagnostic] = editor.diagnostics()["diagnostics"]
+        assert diagnostic["code"] == "NTX8"
+    finally:
+        editor.server.stop()
+
+    engine = "_compile_inprocess" if in_memory else "_compile_subprocess"
+    assert [name for name, *_ in seen] == [engine]
+    for _, names, files, changed in seen:
+        assert names == [".main.natrix-1-2.vy", "main.vy"]
+        assert files == [file_path]
+        assert not changed
+
+
+def test_serve_lsp_over_stdio():
+    stdin = io.BytesIO()
+    for message in [
+        {"jsonrpc": "2.0", "id": 1, "method": "shutdown"},
+        {"jsonrpc": "2.0", "id": 2, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "id": 3, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "id": 4, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]:
+        write_message(stdin, message)
+    stdin.seek(0)
+    stdout = io.BytesIO()
+
+    assert serve_lsp(stdin=stdin, stdout=stdout) == 0
+
+    stdout.seek(0)
+    responses = []
+    while (message := read_message(stdout)) is not None:
+        responses.append(message)
+    # Requests before `initialize` are rejected
+    assert responses[0]["error"]["code"] == -32002
+    assert responses[1]["result"]["serverInfo"]["name"] == "natrix"
+    # `initialize` is only accepted once
+    assert responses[2]["error"]["code"] == -32600
+    assert responses[3] == {"jsonrpc": "2.0", "id": 4, "result": None}
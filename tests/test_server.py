@@ -0,0 +1,216 @@
+"""Tests for the lint server and its client."""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from natrix import OutputFormatter, issue_to_json, lint_files
+from natrix.context import ProjectContext
+from natrix.server import (
+    INVALID_PARAMS,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    NatrixServer,
+    RequestError,
+    run_client,
+    send_request,
+    serve_stdio,
+    serve_unix,
+)
+
+SOURCE = """# pragma version >=0.4.0
+
+@external
+@pure
+def value() -> uint256:
+    unused: uint256 = 1
+    return 2
+"""
+
+
+def project_key(extra_paths=(), engine="subprocess"):
+    return (Path.cwd(), os.environ["PATH"], extra_paths, engine)
+
+
+def request(method, params=None, request_id=1):
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return json.dumps(message)
+
+
+def test_lint_request_follows_edits(tmp_path):
+    file_path = (tmp_path / "main.vy").resolve()
+    file_path.write_text(SOURCE)
+    server = NatrixServer()
+
+    response = server.handle_message(request("lint", {"files": [str(tmp_path)]}))
+
+    # Issues have the schema of `natrix lint --json`
+    expected = lint_files([file_path], ProjectContext([file_path]), OutputFormatter())
+    assert response == {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": {
+            "issues": [issue_to_json(issue) for issue in expected],
+            "messages": [],
+        },
+    }
+
+    # The project is kept compiled, and updated with the changed files
+    context = server.projects[project_key()].context
+    file_path.write_text(SOURCE.replace("    unused: uint256 = 1\n", ""))
+    response = server.handle_message(request("lint", {"files": [str(file_path)]}))
+    assert response["result"]["issues"] == []
+    assert server.projects[project_key()].context is context
+
+
+def test_lint_request_compiles_in_client_directory(tmp_path, monkeypatch):
+    # `lib/pypi` is a default search path, relative to the working directory
+    (tmp_path / "lib" / "pypi").mkdir(parents=True)
+    (tmp_path / "lib" / "pypi" / "provider.vy").write_text(
+        "# pragma version >=0.4.0\n\nVALUE: constant(uint256) = 1\n"
+    )
+    file_path = tmp_path / "main.vy"
+    file_path.write_text(
+        "# pragma version >=0.4.0\n\nimport provider\n\n"
+        "@external\n@pure\ndef value() -> uint256:\n    return provider.VALUE\n"
+    )
+    server = NatrixServer()
+    params = {"files": [str(file_path)], "env_path": os.environ["PATH"]}
+
+    # The server runs elsewhere
+    response = server.handle_message(request("lint", params))
+    assert "provider" in response["error"]["message"]
+
+    response = server.handle_message(request("lint", {**params, "cwd": str(tmp_path)}))
+    assert response["result"] == {"issues": [], "messages": []}
+    # The server keeps running in its own directory
+    assert Path.cwd() != tmp_path
+    monkeypatch.chdir(tmp_path)
+    assert project_key() in server.projects
+
+
+def test_invalid_requests():
+    server = NatrixServer()
+
+    assert server.handle_message("{")["error"]["code"] == PARSE_ERROR
+    response = server.handle_message(request("lint_everything"))
+    assert response["error"]["code"] == METHOD_NOT_FOUND
+    response = server.handle_message(request("lint", {"files": "main.vy"}))
+    assert response["error"]["code"] == INVALID_PARAMS
+    response = server.handle_message(request("shutdown", {"cwd": "/missing"}))
+    assert response["error"]["code"] == INVALID_PARAMS
+    # Notifications aren't answered
+    assert server.handle_message('{"jsonrpc": "2.0", "method": "shutdown"}') is None
+    assert not server.running
+
+
+def test_serve_stdio_stops_on_shutdown(tmp_path):
+    file_path = tmp_path / "main.vy"
+    file_path.write_text(SOURCE)
+    lines = [
+        request("exports", {"file_path": str(file_path)}) + "\n",
+        request("shutdown", request_id=2) + "\n",
+        request("exports", {"file_path": str(file_path)}, request_id=3) + "\n",
+    ]
+    output = []
+
+    class Output:
+        def write(self, text):
+            output.append(json.loads(text))
+
+        def flush(self):
+            pass
+
+    serve_stdio(NatrixServer(), lines, Output())
+
+    assert [response["id"] for response in output] == [1, 2]
+    assert output[0]["result"]["output"].endswith("main.value\n)")
+
+
+def start_server(server, socket_path, **kwargs):
+    thread = threading.Thread(
+        target=serve_unix, args=(server, socket_path), kwargs=kwargs
+    )
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not socket_path.exists():
+        assert time.monotonic() < deadline, "the server didn't start"
+        time.sleep(0.01)
+    return thread
+
+
+def test_client_forwards_to_unix_socket(tmp_path, capsys):
+    file_path = tmp_path / "main.vy"
+    file_path.write_text(SOURCE)
+    socket_path = tmp_path / "server.sock"
+    server = NatrixServer()
+    thread = start_server(server, socket_path)
+    try:
+        assert run_client(["lint", str(file_path), "--json"], socket_path) == 1
+        issues = json.loads(capsys.readouterr().out)
+        assert [issue["code"] for issue in issues] == ["NTX8"]
+        # The request was answered by the server
+        assert project_key() in server.projects
+    finally:
+        send_request(socket_path, "shutdown", {})
+        thread.join()
+
+    assert not socket_path.exists()
+    # Without a server, the command runs locally
+    with pytest.raises(SystemExit) as exc_info:
+        run_client(["lint", str(file_path), "--json"], socket_path)
+    assert exc_info.value.code == 1
+
+
+def test_socket_is_private_from_creation(tmp_path, monkeypatch):
+    modes = []
+    original_server_bind = socketserver.UnixStreamServer.server_bind
+
+    def recording_server_bind(self):
+        original_server_bind(self)
+        modes.append(Path(self.server_address).stat().st_mode & 0o777)
+
+    monkeypatch.setattr(
+        socketserver.UnixStreamServer, "server_bind", recording_server_bind
+    )
+    socket_path = tmp_path / "server.sock"
+    umask = os.umask(0o022)
+    try:
+        thread = start_server(NatrixServer(), socket_path)
+        send_request(socket_path, "shutdown", {})
+        thread.join()
+    finally:
+        os.umask(umask)
+
+    # Nobody else could connect between the creation of the socket and now
+    assert modes == [0o600]
+    # The umask of the process is restored
+    assert os.umask(umask) == 0o022
+
+
+def test_stalled_client_does_not_block_others(tmp_path):
+    socket_path = tmp_path / "server.sock"
+    thread = start_server(NatrixServer(), socket_path, connection_timeout=0.2)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stalled:
+            stalled.connect(str(socket_path))
+            # A request that is never finished
+            stalled.sendall(b'{"jsonrpc": "2.0"')
+
+            start = time.monotonic()
+            with pytest.raises(RequestError, match="Unknown method"):
+                send_request(socket_path, "lint_everything", {})
+            assert time.monotonic() - start < 5
+            # The stalled connection was closed
+            assert stalled.recv(1) == b""
+    finally:
+        send_request(socket_path, "shutdown", {})
+        thread.join()
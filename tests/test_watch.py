@@ -0,0 +1,70 @@
+"""Tests for watch mode."""
+
+import natrix
+from natrix import OutputFormatter, lint_files, watch_and_lint
+from natrix.context import ProjectContext
+from natrix.watch import FileWatcher
+
+SOURCE = """# pragma version >=0.4.0
+
+@external
+@pure
+def value() -> uint256:
+    unused: uint256 = 1
+    return 2
+"""
+
+
+def test_file_watcher_reports_changes(tmp_path):
+    existing = tmp_path / "existing.vy"
+    existing.write_text(SOURCE)
+    outside = tmp_path.parent / f"{tmp_path.name}_outside.vy"
+    outside.write_text(SOURCE)
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    watcher = FileWatcher([tmp_path], (".vy", ".vyi"))
+    assert watcher.poll() == set()
+
+    # Files watched individually are only reported once they change
+    watcher.set_files([outside])
+    assert watcher.poll() == set()
+
+    created = tmp_path / "created.vyi"
+    created.write_text("")
+    existing.write_text(SOURCE + "\n")
+    outside.unlink()
+    (tmp_path / "notes.txt").write_text("still ignored")
+
+    assert watcher.poll() == {
+        created.resolve(),
+        existing.resolve(),
+        outside.resolve(),
+    }
+    assert watcher.poll() == set()
+
+
+def test_watch_only_prints_changed_issues(tmp_path, monkeypatch, capsys):
+    file_path = (tmp_path / "main.vy").resolve()
+    file_path.write_text(SOURCE)
+    context = ProjectContext([file_path])
+    formatter = OutputFormatter()
+    issues = lint_files([file_path], context, formatter)
+    assert [issue.code for issue in issues] == ["NTX8"]
+
+    def edit():
+        file_path.write_text(SOURCE.replace("    unused: uint256 = 1\n", ""))
+
+    def stop():
+        raise KeyboardInterrupt
+
+    steps = iter([lambda: None, edit, stop])
+    monkeypatch.setattr(natrix.time, "sleep", lambda _interval: next(steps)())
+
+    remaining = watch_and_lint(
+        FileWatcher([tmp_path], (".vy",)), context, formatter, issues
+    )
+
+    assert remaining == []
+    output = capsys.readouterr().out
+    assert "1 file(s) changed, relinting 1 file(s)." in output
+    assert f"Resolved {file_path}:6:4 NTX8" in output